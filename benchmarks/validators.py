@@ -0,0 +1,63 @@
+"""
+Compare the compiled `ResourceModel.validator` with the `schema` library
+interpreting `ResourceModel.schema`, on single payloads and on csv import
+sized batches.
+
+    $ make benchmark
+"""
+import timeit
+
+from sfg_catalog.resources.models import ResourceModel
+
+NUMBER = 20000
+BATCH_SIZE = 1000
+
+payload = {
+    'sku': 'ME888SHM70XSB',
+    'seller': 'mega_boots',
+    'campaign_code': '90',
+    'product_name': 'Bota Coturno em Couro Mega Boots 6017 Preto',
+    'brand': 'Mega Boots',
+    'category': 'calcados',
+    'subcategory': 'calcados-masculinos',
+    'size': '40',
+    'list_price': '199.9',
+    'price': '149.9'
+}
+batch = [dict(payload, sku=str(i)) for i in range(BATCH_SIZE)]
+
+
+def schema_validate_many(payloads):
+    for item in payloads:
+        ResourceModel.schema.validate(item)
+
+
+def report(name, seconds, number):
+    print('{:<28} {:>10.2f} us/payload'.format(
+        name, seconds / number * 1000000
+    ))
+
+
+def main():
+    cases = (
+        ('schema.validate', lambda: ResourceModel.schema.validate(payload)),
+        ('validator.validate', lambda: ResourceModel.validator.validate(
+            payload
+        ))
+    )
+    for name, case in cases:
+        report(name, timeit.timeit(case, number=NUMBER), NUMBER)
+
+    number = NUMBER // BATCH_SIZE
+    cases = (
+        ('schema.validate (batch)', lambda: schema_validate_many(batch)),
+        ('validator.validate_many', lambda: (
+            ResourceModel.validator.validate_many(batch)
+        ))
+    )
+    for name, case in cases:
+        report(name, timeit.timeit(case, number=number), number * BATCH_SIZE)
+
+
+if __name__ == '__main__':
+    main()
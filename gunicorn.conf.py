@@ -0,0 +1,24 @@
+# Production serving, run with:
+#   gunicorn sfg_catalog:create_app -c gunicorn.conf.py
+# every setting comes from an environment variable, see sfg_catalog.settings
+from sfg_catalog.settings import (
+    WEB_BIND,
+    WEB_GRACEFUL_TIMEOUT,
+    WEB_KEEPALIVE,
+    WEB_REUSE_PORT,
+    WEB_TIMEOUT,
+    WEB_WORKER_CLASS,
+    WEB_WORKERS
+)
+
+bind = WEB_BIND
+workers = WEB_WORKERS
+worker_class = WEB_WORKER_CLASS
+keepalive = WEB_KEEPALIVE
+timeout = WEB_TIMEOUT
+# the aiohttp worker waits 95% of it for the in-flight requests, the
+# import jobs drain meanwhile within IMPORT_JOB_DRAIN_TIMEOUT
+graceful_timeout = WEB_GRACEFUL_TIMEOUT
+# SO_REUSEPORT lets a new gunicorn bind the same port while the old one
+# drains, the kernel balancing the connections between both
+reuse_port = WEB_REUSE_PORT
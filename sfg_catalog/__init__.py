@@ -1,10 +1,5 @@
-import asyncio
-
 import yaml
 
-from .main import build_app
+from .main import build_app, create_app  # noqa
 
 yaml.warnings({'YAMLLoadWarning': False})
-
-loop = asyncio.get_event_loop()
-app = build_app(loop=loop)
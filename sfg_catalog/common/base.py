@@ -1,6 +1,20 @@
+import base64
+import binascii
+import hashlib
 import json
 
-from aiohttp.web import Response, View
+from aiohttp.hdrs import IF_NONE_MATCH
+from aiohttp.web import Response, StreamResponse, View
+from aiohttp.web_exceptions import HTTPBadRequest
+from bson import ObjectId
+from bson.errors import InvalidId
+from bson.raw_bson import RawBSONDocument
+
+from sfg_catalog.common.encoders import decode_raw_documents, json_default
+from sfg_catalog.common.models import Record
+
+JSON = 'application/json'
+NDJSON = 'application/x-ndjson'
 
 
 class BaseView(View):
@@ -8,9 +22,18 @@ class BaseView(View):
     id_fields = (
         '_id',
         'created_at',
-        'updated_at'
+        'updated_at',
+        'fingerprint',
+        'revision'
     )
 
+    def _to_content(self, content):
+        if isinstance(content, Record):
+            return content.to_dict()
+        if isinstance(content, list):
+            return [self._to_content(item) for item in content]
+        return content
+
     def _clean_ids(self, content):
         if isinstance(content, list):
             [self._clean_ids(i) for i in content]
@@ -23,15 +46,166 @@ class BaseView(View):
             else:
                 self._clean_ids(content[key])
 
-    def response(self, status_code, content=None):
-        if isinstance(content, (dict, list)):
-            self._clean_ids(content)
-            content = json.dumps(content)
+    def _prepare_projection(self, fields_available, keep_id=False):
+        """
+        Build the mongo projection for the `fields` query parameter. The
+        id fields are left out at query time, `_id` is only kept when
+        `keep_id` is set.
+        """
+        fields = self.request.query.get('fields', '')
+        fields = [field.strip() for field in fields.split(',')]
+        fields = [field for field in fields if field]
+
+        if not fields:
+            projection = dict.fromkeys(self.id_fields, 0)
+            if keep_id:
+                del projection['_id']
+            return projection
+
+        invalid_fields = [
+            field for field in fields if field not in fields_available
+        ]
+        if invalid_fields:
+            raise HTTPBadRequest(
+                reason='Invalid fields {}'.format(', '.join(invalid_fields))
+            )
+
+        projection = dict.fromkeys(fields, 1)
+        projection['_id'] = int(keep_id)
+        return projection
+
+    def _with_field(self, projection, field):
+        """
+        Make sure `projection` keeps `field`.
+        """
+        projection = dict(projection)
+        if any(value for key, value in projection.items() if key != '_id'):
+            projection[field] = 1
+        else:
+            projection.pop(field, None)
+        return projection
+
+    def _raw_projection(self, projection):
+        """
+        The projection to read raw documents with. The id fields are left
+        out when raw documents are decoded, so a projection only leaving
+        them out is dropped and cached documents are served untouched.
+        """
+        if all(
+            not value and field in self.id_fields
+            for field, value in projection.items()
+        ):
+            return None
+        return projection
+
+    def etag(self, *parts):
+        content = json.dumps(parts, sort_keys=True, default=json_default)
+        return '"{}"'.format(hashlib.sha1(content.encode()).hexdigest())
+
+    def not_modified(self, etag):
+        """
+        Whether the `If-None-Match` header of the request matches `etag`,
+        using the weak comparison: proxies and compressing middlewares
+        may have turned it into a weak `W/` one.
+        """
+        if_none_match = self.request.headers.get(IF_NONE_MATCH)
+        if not if_none_match:
+            return False
+        etags = [
+            _strip_weak(value.strip()) for value in if_none_match.split(',')
+        ]
+        return _strip_weak(etag) in etags or '*' in etags
+
+    def _encode_cursor(self, object_id):
+        return base64.urlsafe_b64encode(ObjectId(object_id).binary).decode()
+
+    def _decode_cursor(self, cursor):
+        try:
+            return ObjectId(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, InvalidId, TypeError, ValueError):
+            raise HTTPBadRequest(reason='Invalid cursor')
 
-        content_type = 'application/json' if content else None
+    def _prepare_content(self, content):
+        if isinstance(content, RawBSONDocument):
+            return decode_raw_documents([content], self.id_fields)[0]
+        if content and isinstance(content, list) and isinstance(
+            content[0], RawBSONDocument
+        ):
+            return decode_raw_documents(content, self.id_fields)
+
+        content = self._to_content(content)
+        self._clean_ids(content)
+        return content
+
+    def serialize(self, content):
+        return json.dumps(self._prepare_content(content), default=json_default)
+
+    async def cached_content(self, cache, key, load):
+        """
+        Return the serialized content for `key` from `cache`. On a miss it
+        is loaded with `load()` and cached, unless the cache was
+        invalidated meanwhile.
+        """
+        content = cache.get(key)
+        if content is None:
+            generation = cache.generation
+            content = self.serialize(await load())
+            if generation == cache.generation:
+                cache.set(key, content)
+        return content
+
+    def response(self, status_code, content=None, headers=None):
+        if isinstance(content, (dict, list, Record, RawBSONDocument)):
+            content = self.serialize(content)
+
+        content_type = JSON if content else None
 
         return Response(
             status=status_code,
             text=content,
-            content_type=content_type
+            content_type=content_type,
+            headers=headers
         )
+
+    async def stream_response(self, status_code, batches, content_type=JSON,
+                              headers=None):
+        """
+        Write the documents yielded, in batches, by `batches` as they
+        arrive, either as a json array or as newline delimited json.
+        """
+        response = StreamResponse(status=status_code, headers=headers)
+        response.content_type = content_type
+        response.enable_chunked_encoding()
+        await response.prepare(self.request)
+
+        ndjson = content_type == NDJSON
+        separator = '\n' if ndjson else ','
+        first = True
+
+        if not ndjson:
+            await response.write(b'[')
+
+        async for batch in batches:
+            batch = self._prepare_content(batch)
+            data = separator.join(
+                json.dumps(content, default=json_default)
+                for content in batch
+            )
+            if ndjson:
+                data += '\n'
+            elif not first:
+                data = separator + data
+            first = False
+            await response.write(data.encode())
+
+        if not ndjson:
+            await response.write(b']')
+
+        await response.write_eof()
+        return response
+
+
+def _strip_weak(etag):
+    if etag.startswith('W/'):
+        return etag[2:]
+    return etag
@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple(
+    'CacheInfo', ('hits', 'misses', 'evictions', 'size', 'max_size')
+)
+
+
+class LRUCache:
+    """
+    Bounded in-process cache. Entries expire `ttl` seconds after being
+    set and, once `max_size` is reached, the least recently used one is
+    evicted.
+
+    `generation` changes on every invalidation, so a caller can tell
+    whether an entry was invalidated while it was loading its value and
+    skip storing a stale one.
+    """
+
+    def __init__(self, max_size, ttl=None, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        expires_at = self._clock() + self.ttl if self.ttl else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self.generation += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def info(self):
+        return CacheInfo(
+            self.hits, self.misses, self.evictions, len(self._entries),
+            self.max_size
+        )
@@ -0,0 +1,74 @@
+import datetime
+
+import bson
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(
+        'Object of type {} is not JSON serializable'.format(
+            type(value).__name__
+        )
+    )
+
+
+def decode_raw_document(document):
+    return bson.decode_all(document.raw)[0]
+
+
+def encode_raw_document(content):
+    return RawBSONDocument(bson.BSON.encode(content))
+
+
+def apply_projection(content, projection):
+    """
+    Apply a mongo `projection` of top level fields to a decoded document.
+    """
+    included = {
+        field for field, value in projection.items()
+        if value and field != '_id'
+    }
+    if not included:
+        return {
+            field: value for field, value in content.items()
+            if projection.get(field, 1)
+        }
+    return {
+        field: value for field, value in content.items()
+        if field in included or (field == '_id' and projection.get('_id', 1))
+    }
+
+
+def decode_raw_documents(documents, exclude=()):
+    """
+    Decode a list of `RawBSONDocument` with a single call to the bson C
+    extension, dropping the `exclude` keys at any depth.
+    """
+    content = bson.decode_all(
+        b''.join(document.raw for document in documents)
+    )
+    if exclude:
+        for document in content:
+            _exclude_keys(document, exclude)
+    return content
+
+
+def _exclude_keys(content, exclude):
+    if isinstance(content, list):
+        values = content
+    else:
+        for key in exclude:
+            content.pop(key, None)
+        values = content.values()
+
+    for value in values:
+        if isinstance(value, (dict, list)):
+            _exclude_keys(value, exclude)
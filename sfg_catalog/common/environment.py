@@ -0,0 +1,55 @@
+import os
+
+from schema import SchemaError
+
+
+class ImproperlyConfigured(Exception):
+    pass
+
+
+def load_environment(schema, defaults, environ=os.environ):
+    """
+    Read the settings named by the keys of `defaults` from `environ`,
+    falling back to their default, and validate them with `schema`,
+    which also converts them. An invalid setting raises
+    `ImproperlyConfigured`, so the app doesn't start misconfigured.
+    """
+    values = {
+        name: environ.get(name, default)
+        for name, default in defaults.items()
+    }
+
+    try:
+        return schema.validate(values)
+    except SchemaError as error:
+        raise ImproperlyConfigured(
+            'Invalid settings: {}'.format(error.code)
+        )
+
+
+def optional_integer(value):
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def comma_separated(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def write_concern(value):
+    if value == 'majority':
+        return value
+    return int(value)
+
+
+def boolean(value):
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no', ''):
+        return False
+    raise ValueError('Invalid boolean "{}"'.format(value))
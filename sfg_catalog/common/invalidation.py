@@ -0,0 +1,178 @@
+import asyncio
+import datetime
+import logging
+import uuid
+from collections import OrderedDict, defaultdict
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from sfg_catalog.common.mongo import Mongo
+from sfg_catalog.settings import (
+    INVALIDATION_BUS_COLLECTION,
+    INVALIDATION_BUS_POLL_INTERVAL,
+    INVALIDATION_BUS_SIZE
+)
+
+log = logging.getLogger(__name__)
+
+# messages are read again from a little before the last one seen, as
+# `_id`s generated by different workers are not strictly ordered
+REPLAY_WINDOW = datetime.timedelta(seconds=5)
+SEEN_SIZE = 10000
+
+
+class InvalidationBus:
+    """
+    Broadcasts cache invalidations to every worker through a capped
+    collection. Published messages are handed to the local subscribers
+    right away and written in batches, while a background task tails the
+    collection and hands the messages of the other workers to the local
+    subscribers.
+
+    When the collection can't be tailed (it isn't capped or the server
+    doesn't support tailable cursors) it is polled every
+    `poll_interval` seconds instead.
+
+    A message is a `namespace`, usually a collection name, and the `keys`
+    touched, `None` standing for all of them.
+    """
+
+    def __init__(self, collection_name=INVALIDATION_BUS_COLLECTION,
+                 size=INVALIDATION_BUS_SIZE,
+                 poll_interval=INVALIDATION_BUS_POLL_INTERVAL):
+        self.collection_name = collection_name
+        self.size = size
+        self.poll_interval = poll_interval
+        self.origin = uuid.uuid4().hex
+        self.tailing = True
+        self._subscribers = defaultdict(list)
+        self._pending = []
+        self._pending_event = asyncio.Event()
+        self._seen = OrderedDict()
+        self._last_seen = None
+        self._tasks = []
+
+    def _get_collection(self):
+        return Mongo().db[self.collection_name]
+
+    def subscribe(self, namespace, callback):
+        self._subscribers[namespace].append(callback)
+
+    def publish(self, namespace, keys=None):
+        keys = list(keys) if keys is not None else None
+        self._deliver(namespace, keys)
+
+        self._pending.append({
+            'origin': self.origin,
+            'namespace': namespace,
+            'keys': keys
+        })
+        self._pending_event.set()
+
+    async def start(self):
+        try:
+            await self._get_collection().database.create_collection(
+                self.collection_name, capped=True, size=self.size
+            )
+        except CollectionInvalid:
+            pass
+
+        # messages published before this worker started are of no use to
+        # its empty caches
+        self._last_seen = ObjectId()
+        self._tasks = [
+            asyncio.ensure_future(self._listen()),
+            asyncio.ensure_future(self._flush_forever())
+        ]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._flush()
+
+    def _deliver(self, namespace, keys):
+        for callback in self._subscribers.get(namespace, ()):
+            try:
+                callback(keys)
+            except Exception:
+                log.exception(
+                    'Fail to invalidate "{}" keys {}'.format(namespace, keys)
+                )
+
+    async def _flush_forever(self):
+        while True:
+            await self._pending_event.wait()
+            self._pending_event.clear()
+            await self._flush()
+
+    async def _flush(self):
+        messages, self._pending = self._pending, []
+        if not messages:
+            return
+
+        try:
+            await self._get_collection().insert_many(messages, ordered=False)
+        except Exception as e:
+            log.exception('Fail to publish {} invalidations: {}'.format(
+                len(messages), e
+            ))
+
+    async def _listen(self):
+        while True:
+            try:
+                if self.tailing:
+                    await self._tail()
+                else:
+                    await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.tailing:
+                    log.warning(
+                        'Fail to tail "{}", polling it instead: {}'.format(
+                            self.collection_name, e
+                        )
+                    )
+                    self.tailing = False
+                else:
+                    log.exception('Fail to poll "{}": {}'.format(
+                        self.collection_name, e
+                    ))
+
+            await asyncio.sleep(self.poll_interval)
+
+    def _query(self):
+        since = self._last_seen.generation_time - REPLAY_WINDOW
+        return {'_id': {'$gt': ObjectId.from_datetime(since)}}
+
+    async def _tail(self):
+        cursor = self._get_collection().find(
+            self._query(), cursor_type=CursorType.TAILABLE_AWAIT
+        )
+        while cursor.alive:
+            async for message in cursor:
+                self._receive(message)
+
+    async def _poll(self):
+        cursor = self._get_collection().find(
+            self._query(), sort=[('$natural', 1)]
+        )
+        async for message in cursor:
+            self._receive(message)
+
+    def _receive(self, message):
+        if message['_id'] in self._seen:
+            return
+
+        self._seen[message['_id']] = True
+        if len(self._seen) > SEEN_SIZE:
+            self._seen.popitem(last=False)
+        if message['_id'].generation_time > self._last_seen.generation_time:
+            self._last_seen = message['_id']
+
+        if message['origin'] != self.origin:
+            self._deliver(message['namespace'], message['keys'])
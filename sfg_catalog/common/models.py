@@ -1,36 +1,230 @@
+import hashlib
+import json
 import logging
+from collections import namedtuple
 
+import bson
 from attrdict import AttrDict
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
-from sfg_catalog.common.mongo import Mongo
+from sfg_catalog.common.cache import LRUCache
+from sfg_catalog.common.encoders import (
+    RAW_CODEC_OPTIONS,
+    apply_projection,
+    decode_raw_document,
+    encode_raw_document
+)
+from sfg_catalog.common.mongo import (
+    LIST_READ_PREFERENCE,
+    WRITE_CONCERNS,
+    Mongo
+)
+from sfg_catalog.common.singleflight import SingleFlight
+from sfg_catalog.common.validators import CompiledSchema
+from sfg_catalog.settings import (
+    COLLECTION_VERSIONS,
+    LIST_CACHE_TTL,
+    MODEL_CACHE_TTL,
+    MOTOR_BULK_WRITE_BATCH_SIZE,
+    MOTOR_STREAM_BATCH_SIZE
+)
 
 log = logging.getLogger(__name__)
 
+# key of the collection version in `BaseModel.list_cache`
+VERSION_KEY = ('version',)
+
+UpsertResult = namedtuple(
+    'UpsertResult', ('created', 'updated', 'skipped', 'failures')
+)
+
+
+def _flight_key(*args):
+    # bson tells apart values json wouldn't, like an `ObjectId` from its
+    # string
+    return bson.BSON.encode({'args': args})
+
+
+class Record:
+    """
+    Read only view of a stored document, built without validation. Its
+    `__slots__` are the fields it keeps, any other key is dropped.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, document):
+        for field in self.__slots__:
+            if field in document:
+                setattr(self, field, document[field])
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field)
+
+    def __contains__(self, field):
+        return hasattr(self, field)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, self.to_dict())
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def to_dict(self):
+        return {
+            field: getattr(self, field)
+            for field in self.__slots__
+            if hasattr(self, field)
+        }
+
 
 class BaseModel(AttrDict):
     schema = None
     collection_name = None
+    bulk_write_batch_size = MOTOR_BULK_WRITE_BATCH_SIZE
+    stream_batch_size = MOTOR_STREAM_BATCH_SIZE
+    fingerprint_fields = ()
+    indexes = ()
+    # bookkeeping fields kept by the model itself, left out on reads
+    storage_fields = ('fingerprint', 'revision')
+    # versioned models count the writes of each document in `revision`
+    # and the writes of the whole collection in `collection_versions`
+    versioned = False
+    # `Record` subclass built by `list` and `iter_batches`
+    record_class = None
+    # `schema` compiled when the model is defined
+    validator = None
+    # `get` by `cache_key_field` alone is served from an LRU cache of
+    # `cache_size` documents, 0 disables it
+    cache_size = 0
+    cache_ttl = MODEL_CACHE_TTL
+    cache_key_field = 'id'
+    cache = None
+    # serialized listings cached by the views, up to `list_cache_size`
+    # of them, every write to the collection drops them all
+    list_cache_size = 0
+    list_cache_ttl = LIST_CACHE_TTL
+    list_cache = None
+    # `sfg_catalog.common.invalidation.InvalidationBus` shared by the
+    # models, set when the app starts
+    invalidation_bus = None
+    # coalesces identical reads in flight, writes forget them so reads
+    # started afterwards never get what was read before
+    flights = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.schema:
+            cls.validator = CompiledSchema(cls.schema)
+        cls.cache = (
+            LRUCache(cls.cache_size, cls.cache_ttl)
+            if cls.cache_size else None
+        )
+        cls.list_cache = (
+            LRUCache(cls.list_cache_size, cls.list_cache_ttl)
+            if cls.list_cache_size else None
+        )
+        cls.flights = SingleFlight()
 
     def __init__(self, **kwargs):
-        if self.schema:
-            kwargs = self.schema.validate(kwargs)
+        if self.validator:
+            kwargs = self.validator.validate(kwargs)
         super().__init__(**kwargs)
 
     def to_dict(self):
         return self.__getstate__()[0]
 
+    @classmethod
+    def _fingerprint(cls, model_dict):
+        content = json.dumps(
+            [model_dict.get(field) for field in cls.fingerprint_fields]
+        )
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    @classmethod
+    def _with_fingerprint(cls, model_dict):
+        if cls.fingerprint_fields:
+            model_dict['fingerprint'] = cls._fingerprint(model_dict)
+        return model_dict
+
+    @classmethod
+    def _new_document(cls, model_dict):
+        model_dict = cls._with_fingerprint(model_dict)
+        if cls.versioned:
+            model_dict['revision'] = 1
+        return model_dict
+
+    @classmethod
+    def _with_revision(cls, update):
+        if cls.versioned:
+            update['$inc'] = {'revision': 1}
+        return update
+
     @classmethod
     def _get_db(cls):
         cls.mongo = Mongo()
         return cls.mongo.db
 
     @classmethod
-    def _get_collection(cls):
+    def _get_collection(cls, write_profile=None):
         if not cls.collection_name:
             raise TypeError('You must define `colection_name`')
 
-        return getattr(cls._get_db(), cls.collection_name)
+        collection = getattr(cls._get_db(), cls.collection_name)
+        if write_profile:
+            return collection.with_options(
+                write_concern=WRITE_CONCERNS[write_profile]
+            )
+        return collection
+
+    @classmethod
+    def _get_versions_collection(cls):
+        return getattr(cls._get_db(), COLLECTION_VERSIONS)
+
+    @classmethod
+    async def get_version(cls):
+        """
+        Return the version of the collection, changed by every write of
+        a versioned model. It is kept in the `list_cache`, so it is as
+        fresh as the listings cached.
+        """
+        cache = cls.list_cache
+        version = cache.get(VERSION_KEY) if cache is not None else None
+        if version is not None:
+            return version
+
+        generation = cache.generation if cache is not None else None
+        document = await cls._get_versions_collection().find_one(
+            {'_id': cls.collection_name}
+        )
+        version = document['version'] if document else 0
+        if cache is not None and generation == cache.generation:
+            cache.set(VERSION_KEY, version)
+        return version
+
+    @classmethod
+    async def _bump_version(cls):
+        if not cls.versioned:
+            return
+        try:
+            await cls._get_versions_collection().update_one(
+                {'_id': cls.collection_name}, {'$inc': {'version': 1}},
+                upsert=True
+            )
+        except Exception as e:
+            log.exception('Fail to bump the version of "{}": {}'.format(
+                cls.collection_name, e
+            ))
 
     async def _insert(self):
         log.info('Save new document in collection "{}"'.format(
@@ -38,7 +232,7 @@ class BaseModel(AttrDict):
         ))
 
         result = await self._get_collection().insert_one(
-            self.to_dict(),
+            self._new_document(self.to_dict()),
         )
         self['_id'] = result.inserted_id
 
@@ -49,11 +243,12 @@ class BaseModel(AttrDict):
         log.info('Edit document "{}" in collection "{}"'.format(
             str(self['_id']), self.collection_name
         ))
-        model_dict = self.to_dict()
+        model_dict = self._with_fingerprint(self.to_dict())
         del model_dict['_id']
 
         await self._get_collection().update_one(
-            {'_id': self['_id']}, {'$set': model_dict}, upsert=False
+            {'_id': self['_id']}, self._with_revision({'$set': model_dict}),
+            upsert=False
         )
 
     async def save(self):
@@ -61,6 +256,8 @@ class BaseModel(AttrDict):
             await self._update()
         else:
             await self._insert()
+        await self._bump_version()
+        self._invalidate_self()
 
     async def delete(self):
         if not isinstance(self['_id'], ObjectId):
@@ -70,32 +267,473 @@ class BaseModel(AttrDict):
             str(self['_id']), self.collection_name
         ))
         await self._get_collection().delete_one({'_id': self['_id']})
+        await self._bump_version()
+        self._invalidate_self()
+
+    def _invalidate_self(self):
+        if self.cache_key_field in self:
+            self.invalidate(self[self.cache_key_field])
+        else:
+            self.invalidate_all()
+
+    @classmethod
+    def invalidate(cls, *keys):
+        """
+        Drop `keys` from the cache of every worker, through the
+        `invalidation_bus` when there is one.
+        """
+        cls._publish_invalidation(list(keys))
 
     @classmethod
-    async def get(cls, **kwargs):
-        result = await cls._get_collection().find_one(kwargs)
+    def invalidate_all(cls):
+        cls._publish_invalidation(None)
+
+    @classmethod
+    def _publish_invalidation(cls, keys):
+        cls.flights.clear()
+        if cls.cache is None and cls.list_cache is None:
+            return
+        if cls.invalidation_bus:
+            cls.invalidation_bus.publish(cls.collection_name, keys)
+        else:
+            cls.evict(keys)
+
+    @classmethod
+    def evict(cls, keys):
+        """
+        Drop `keys`, or every document when `None`, from the cache of this
+        worker only, along with every cached listing.
+        """
+        cls.flights.clear()
+        if cls.list_cache is not None:
+            cls.list_cache.clear()
+        if cls.cache is None:
+            return
+        if keys is None:
+            cls.cache.clear()
+            return
+        for key in keys:
+            cls.cache.delete(key)
+
+    @classmethod
+    def clear_cache(cls):
+        if cls.cache is not None:
+            cls.cache.clear()
+        if cls.list_cache is not None:
+            cls.list_cache.clear()
+
+    @classmethod
+    def cache_info(cls):
+        if cls.cache is not None:
+            return cls.cache.info()
+
+    @classmethod
+    def _hydrate(cls, document):
+        """
+        Build a model from a stored document. It was validated when it was
+        written, so the schema is skipped.
+        """
+        for field in cls.storage_fields:
+            document.pop(field, None)
+
+        model = cls.__new__(cls)
+        AttrDict.__init__(model, **document)
+        return model
+
+    @classmethod
+    def _load(cls, document):
+        if cls.record_class:
+            return cls.record_class(document)
+        return cls._hydrate(document)
+
+    @classmethod
+    def _get_read_collection(cls, raw=False, listing=False):
+        # raw reads keep the documents as `RawBSONDocument`, left for
+        # `sfg_catalog.common.encoders` to encode without building models
+        options = {}
+        if raw:
+            options['codec_options'] = RAW_CODEC_OPTIONS
+        # listings may be read from secondaries, see
+        # `MOTOR_LIST_READ_PREFERENCE`
+        if listing:
+            options['read_preference'] = LIST_READ_PREFERENCE
+
+        collection = cls._get_collection()
+        if options:
+            return collection.with_options(**options)
+        return collection
+
+    @classmethod
+    async def get(cls, projection=None, raw=False, **kwargs):
+        if cls.cache is not None and list(kwargs) == [cls.cache_key_field]:
+            return await cls._get_cached(
+                kwargs[cls.cache_key_field], projection, raw
+            )
+
+        def load():
+            return cls._get_read_collection(raw).find_one(
+                kwargs, projection=projection
+            )
+
+        # raw documents can't be changed, so they can be shared
+        if raw:
+            return await cls.flights.do(
+                _flight_key('get', kwargs, projection), load
+            )
+
+        result = await load()
         if result:
-            return cls(**result)
+            return cls._hydrate(result)
+        return result
 
     @classmethod
-    async def list(cls, query=None, skip=0, limit=0):
-        cursor = cls._get_collection().find(
-            query or {}, limit=limit, skip=skip
+    async def _get_cached(cls, key, projection=None, raw=False):
+        # the whole document is cached as raw bson, so it can't be changed
+        # through the value returned and serves any projection
+        async def load():
+            generation = cls.cache.generation
+            document = await cls._get_read_collection(raw=True).find_one(
+                {cls.cache_key_field: key}
+            )
+            if document is not None and generation == cls.cache.generation:
+                cls.cache.set(key, document)
+            return document
+
+        document = cls.cache.get(key)
+        if document is None:
+            document = await cls.flights.do(('cached', key), load)
+            if document is None:
+                return None
+
+        return cls._from_raw(document, projection, raw)
+
+    @classmethod
+    async def get_many(cls, keys, projection=None, raw=False):
+        """
+        Fetch the documents whose `cache_key_field` is one of `keys` with
+        a single `$in` query, returning them by key. Keys not found are
+        left out. The cached documents are served from the cache and the
+        ones fetched are cached.
+        """
+        documents = {}
+        missing = []
+
+        for key in dict.fromkeys(keys):
+            document = cls.cache.get(key) if cls.cache is not None else None
+            if document is None:
+                missing.append(key)
+            else:
+                documents[key] = document
+
+        if missing:
+            generation = cls.cache.generation if cls.cache is not None else 0
+            cursor = cls._get_read_collection(raw=True).find(
+                {cls.cache_key_field: {'$in': missing}}
+            )
+            async for document in cursor:
+                key = document[cls.cache_key_field]
+                documents[key] = document
+                if cls.cache is not None and (
+                    generation == cls.cache.generation
+                ):
+                    cls.cache.set(key, document)
+
+        return {
+            key: cls._from_raw(document, projection, raw)
+            for key, document in documents.items()
+        }
+
+    @classmethod
+    def _from_raw(cls, document, projection=None, raw=False):
+        if raw and not projection:
+            return document
+
+        content = decode_raw_document(document)
+        if projection:
+            content = apply_projection(content, projection)
+        if raw:
+            return encode_raw_document(content)
+        return cls._hydrate(content)
+
+    @classmethod
+    async def list(cls, query=None, skip=0, limit=0, sort=None,
+                   projection=None, raw=False):
+        def load():
+            return cls._list(query, skip, limit, sort, projection, raw)
+
+        # only raw documents and records can't be changed, so they can be
+        # shared, each caller gets its own list of them though
+        if raw or cls.record_class:
+            key = _flight_key(
+                'list', query, skip, limit, sort, projection, raw
+            )
+            return list(await cls.flights.do(key, load))
+        return await load()
+
+    @classmethod
+    async def _list(cls, query, skip, limit, sort, projection, raw):
+        cursor = cls._get_read_collection(raw, listing=True).find(
+            query or {}, projection=projection, limit=limit, skip=skip,
+            sort=sort
         )
 
         result = []
 
         while await cursor.fetch_next:
-            result.append(cls(**cursor.next_object()))
+            document = cursor.next_object()
+            result.append(document if raw else cls._load(document))
 
         return result
 
+    @classmethod
+    async def iter_batches(cls, query=None, skip=0, limit=0, sort=None,
+                           projection=None, batch_size=None, raw=False):
+        """
+        Like `list`, but yields the documents in batches of at most
+        `batch_size` as they arrive from the cursor, so callers never hold
+        the whole result.
+        """
+        batch_size = batch_size or cls.stream_batch_size
+        cursor = cls._get_read_collection(raw, listing=True).find(
+            query or {}, projection=projection, limit=limit, skip=skip,
+            sort=sort, batch_size=batch_size
+        )
+
+        while True:
+            documents = await cursor.to_list(batch_size)
+            if not documents:
+                break
+            if not raw:
+                documents = [cls._load(document) for document in documents]
+            yield documents
+
+    @classmethod
+    async def find_and_update(cls, query, values):
+        """
+        Set `values` on the document matching `query` in a single round
+        trip, returning it as it is after the update, or `None` when there
+        is no such document.
+        """
+        result = await cls._get_collection().find_one_and_update(
+            query, cls.update_document(values),
+            return_document=ReturnDocument.AFTER
+        )
+        if not result:
+            return None
+
+        await cls._bump_version()
+        model = cls._hydrate(result)
+        model._invalidate_self()
+        return model
+
+    @classmethod
+    async def find_and_delete(cls, query):
+        """
+        Delete the document matching `query` in a single round trip,
+        returning it, or `None` when there is no such document.
+        """
+        result = await cls._get_collection().find_one_and_delete(query)
+        if not result:
+            return None
+
+        await cls._bump_version()
+        model = cls._hydrate(result)
+        model._invalidate_self()
+        return model
+
+    @classmethod
+    def update_document(cls, values):
+        """
+        Build the mongo update setting `values`, keeping the fingerprint
+        in line with them.
+        """
+        update = {}
+        values, unset = cls._fingerprint_update(values)
+        if values:
+            update['$set'] = values
+        if unset:
+            update['$unset'] = dict.fromkeys(unset, '')
+        return cls._with_revision(update)
+
+    @classmethod
+    def _fingerprint_update(cls, values):
+        if not cls.fingerprint_fields:
+            return values, ()
+        if all(field in values for field in cls.fingerprint_fields):
+            return cls._with_fingerprint(dict(values)), ()
+        # without the whole document the fingerprint can't be computed,
+        # so it is dropped and the next import rewrites the document
+        return values, ('fingerprint',)
+
     @classmethod
     async def _create_or_update(cls, id, model_dict):
         await cls._get_collection().update_one(
-            {'id': id}, {'$set': model_dict}, upsert=True
+            {'id': id},
+            cls._with_revision({'$set': cls._with_fingerprint(model_dict)}),
+            upsert=True
+        )
+        await cls._bump_version()
+        cls.invalidate(id)
+
+    @classmethod
+    async def _bulk_create_or_update(cls, model_dicts, batch_size=None):
+        """
+        Upsert `model_dicts` by `id` using unordered `bulk_write` batches.
+        When the model defines `fingerprint_fields`, documents whose
+        stored fingerprint is unchanged are skipped without any write.
+        Failures are reported as `(index, reason)` tuples.
+        """
+        batch_size = batch_size or cls.bulk_write_batch_size
+        created, updated, skipped, failures = 0, 0, 0, []
+
+        for start in range(0, len(model_dicts), batch_size):
+            batch = model_dicts[start:start + batch_size]
+            fingerprints = await cls._get_fingerprints(batch)
+
+            requests = []
+            indexes = []
+            for index, model_dict in enumerate(batch, start):
+                cls._with_fingerprint(model_dict)
+                fingerprint = model_dict.get('fingerprint')
+                if fingerprint and fingerprint == fingerprints.get(
+                    model_dict['id']
+                ):
+                    skipped += 1
+                    continue
+
+                fingerprints[model_dict['id']] = fingerprint
+                requests.append(UpdateOne(
+                    {'id': model_dict['id']},
+                    cls._with_revision({'$set': model_dict}),
+                    upsert=True
+                ))
+                indexes.append(index)
+
+            if not requests:
+                continue
+
+            log.info('Bulk upsert {} documents in collection "{}"'.format(
+                len(requests), cls.collection_name
+            ))
+
+            try:
+                result = await cls._get_collection('bulk').bulk_write(
+                    requests, ordered=False
+                )
+                details = result.bulk_api_result
+            except BulkWriteError as error:
+                details = error.details
+                failures.extend(
+                    (indexes[write_error['index']], write_error['errmsg'])
+                    for write_error in details['writeErrors']
+                )
+            finally:
+                await cls._bump_version()
+                cls.invalidate(
+                    *(model_dicts[index]['id'] for index in indexes)
+                )
+
+            created += details['nUpserted']
+            updated += details['nMatched']
+
+        return UpsertResult(created, updated, skipped, failures)
+
+    @classmethod
+    async def bulk_write(cls, requests, keys=()):
+        """
+        Run the pymongo write `requests` in a single unordered
+        `bulk_write`, dropping `keys` from the cache afterwards. Returns
+        the write errors by the index of the request that failed.
+        """
+        if not requests:
+            return {}
+
+        log.info('Bulk write {} requests in collection "{}"'.format(
+            len(requests), cls.collection_name
+        ))
+
+        try:
+            await cls._get_collection().bulk_write(requests, ordered=False)
+        except BulkWriteError as error:
+            return {
+                write_error['index']: write_error
+                for write_error in error.details['writeErrors']
+            }
+        finally:
+            await cls._bump_version()
+            cls.invalidate(*keys)
+
+        return {}
+
+    @classmethod
+    async def existing_keys(cls, keys):
+        """
+        Return which of `keys` are stored, by `cache_key_field`.
+        """
+        cursor = cls._get_collection().find(
+            {cls.cache_key_field: {'$in': list(keys)}},
+            projection={'_id': 0, cls.cache_key_field: 1}
         )
 
+        existing = set()
+        while await cursor.fetch_next:
+            existing.add(cursor.next_object()[cls.cache_key_field])
+
+        return existing
+
+    @classmethod
+    async def _get_fingerprints(cls, model_dicts):
+        if not cls.fingerprint_fields:
+            return {}
+
+        cursor = cls._get_collection().find(
+            {'id': {'$in': [model_dict['id'] for model_dict in model_dicts]}},
+            projection={'_id': 0, 'id': 1, 'fingerprint': 1}
+        )
+
+        fingerprints = {}
+        while await cursor.fetch_next:
+            document = cursor.next_object()
+            fingerprints[document['id']] = document.get('fingerprint')
+
+        return fingerprints
+
+    @classmethod
+    async def ensure_indexes(cls):
+        if not cls.indexes:
+            return
+
+        log.info('Ensure indexes {} in collection "{}"'.format(
+            [index.document['name'] for index in cls.indexes],
+            cls.collection_name
+        ))
+        await cls._get_collection().create_indexes(list(cls.indexes))
+
+    @classmethod
+    async def index_report(cls):
+        """
+        Compare the declared `indexes` with the ones in the collection,
+        reporting the declared indexes that are `missing`, the existing
+        ones that are `undeclared` and the ones never used since the
+        server started (`unused`).
+        """
+        collection = cls._get_collection()
+        existing = set(await collection.index_information()) - {'_id_'}
+        declared = {index.document['name'] for index in cls.indexes}
+
+        unused = []
+        cursor = collection.aggregate([{'$indexStats': {}}])
+        while await cursor.fetch_next:
+            stats = cursor.next_object()
+            if stats['name'] != '_id_' and not stats['accesses']['ops']:
+                unused.append(stats['name'])
+
+        return {
+            'missing': sorted(declared - existing),
+            'undeclared': sorted(existing - declared),
+            'unused': sorted(unused)
+        }
+
     @classmethod
     async def count(cls, query={}):
         return await cls._get_collection().count_documents(query)
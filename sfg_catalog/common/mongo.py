@@ -1,12 +1,36 @@
 import logging
 
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import (
+    make_read_preference,
+    read_pref_mode_from_name
+)
+from pymongo.write_concern import WriteConcern
 
 from sfg_catalog.common.singleton import SingletonMeta
-from sfg_catalog.settings import MOTOR_DB, MOTOR_MAX_POOL_SIZE, MOTOR_URI
+from sfg_catalog.settings import (
+    MOTOR_COMPRESSORS,
+    MOTOR_DB,
+    MOTOR_LIST_READ_PREFERENCE,
+    MOTOR_MAX_IDLE_TIME_MS,
+    MOTOR_MAX_POOL_SIZE,
+    MOTOR_MIN_POOL_SIZE,
+    MOTOR_SERVER_SELECTION_TIMEOUT_MS,
+    MOTOR_URI,
+    MOTOR_WAIT_QUEUE_TIMEOUT_MS,
+    MOTOR_WRITE_CONCERNS
+)
 
 log = logging.getLogger(__name__)
 
+# `default` is the write concern of the client, `bulk` the one of imports
+WRITE_CONCERNS = {
+    profile: WriteConcern(w=w) for profile, w in MOTOR_WRITE_CONCERNS.items()
+}
+LIST_READ_PREFERENCE = make_read_preference(
+    read_pref_mode_from_name(MOTOR_LIST_READ_PREFERENCE), None
+)
+
 
 class Mongo(metaclass=SingletonMeta):
 
@@ -17,18 +41,29 @@ class Mongo(metaclass=SingletonMeta):
         if self._client:
             return self._client
 
+        options = {
+            'minPoolSize': MOTOR_MIN_POOL_SIZE,
+            'maxPoolSize': MOTOR_MAX_POOL_SIZE,
+            'maxIdleTimeMS': MOTOR_MAX_IDLE_TIME_MS,
+            'waitQueueTimeoutMS': MOTOR_WAIT_QUEUE_TIMEOUT_MS,
+            'serverSelectionTimeoutMS': MOTOR_SERVER_SELECTION_TIMEOUT_MS,
+            'w': MOTOR_WRITE_CONCERNS['default']
+        }
+        if MOTOR_COMPRESSORS:
+            options['compressors'] = ','.join(MOTOR_COMPRESSORS)
+
         log.info(
             'Connection to the mongodb: '
-            '{uri} with pool size: {max_pool_size}'.format(
+            '{uri} with options: {options}'.format(
                 uri=MOTOR_URI,
-                max_pool_size=MOTOR_MAX_POOL_SIZE
+                options=options
             )
         )
 
         self._client = AsyncIOMotorClient(
             MOTOR_URI,
-            maxPoolSize=MOTOR_MAX_POOL_SIZE,
-            io_loop=loop
+            io_loop=loop,
+            **options
         )
 
         log.info('Default mongodb database: {}'.format(self.db.name))
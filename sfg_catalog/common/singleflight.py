@@ -0,0 +1,38 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls by key: while a call for a key is in
+    flight, callers asking for the same key wait for it and share its
+    result, or its exception, instead of starting their own.
+
+    The result is shared, so it should not be changed by the callers.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, function):
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(function())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._forget(key, future))
+
+        # a caller going away must not cancel the call of the others
+        return await asyncio.shield(future)
+
+    def clear(self):
+        """
+        Forget the calls in flight, the next callers start new ones while
+        the current callers still get the results of theirs.
+        """
+        self._calls.clear()
+
+    def _forget(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
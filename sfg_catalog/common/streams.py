@@ -0,0 +1,279 @@
+import asyncio
+import bz2
+import codecs
+import csv
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+READ_SIZE = 64 * 1024
+
+GZIP = 'gzip'
+BZIP2 = 'bzip2'
+ZSTD = 'zstd'
+IDENTITY = 'identity'
+
+CONTENT_ENCODINGS = {
+    'gzip': GZIP,
+    'x-gzip': GZIP,
+    'bzip2': BZIP2,
+    'x-bzip2': BZIP2,
+    'zstd': ZSTD,
+    'identity': IDENTITY
+}
+
+MAGIC_NUMBERS = (
+    (b'\x1f\x8b', GZIP),
+    (b'BZh', BZIP2),
+    (b'\x28\xb5\x2f\xfd', ZSTD)
+)
+MAGIC_SIZE = max(len(magic) for magic, _ in MAGIC_NUMBERS)
+
+
+class StreamError(Exception):
+    pass
+
+
+class FileStream:
+    """
+    Exposes a binary file through the `read_chunk` interface expected by
+    `iter_csv_records`, reading it on the default executor and keeping
+    track of how many bytes were consumed.
+    """
+
+    def __init__(self, file):
+        self._file = file
+        self.bytes_read = 0
+
+    async def read_chunk(self, size=READ_SIZE):
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(None, self._file.read, size)
+        self.bytes_read += len(data)
+        return data
+
+
+class DecompressingStream:
+    """
+    Wraps a `read_chunk` stream, decompressing gzip, bzip2 or zstd
+    content on the fly. The compression is taken from `content_encoding`
+    when given, otherwise it is detected from the first bytes, and plain
+    content is passed through untouched.
+    """
+
+    def __init__(self, stream, content_encoding=None):
+        self._stream = stream
+        self._encoding = None
+        self._decompressor = None
+        self._started = False
+        self._eof = False
+
+        if content_encoding:
+            self._encoding = CONTENT_ENCODINGS.get(
+                content_encoding.strip().lower()
+            )
+            if not self._encoding:
+                raise StreamError(
+                    'Unsupported content encoding {}'.format(
+                        content_encoding
+                    )
+                )
+        if self._encoding == ZSTD and not zstandard:
+            raise StreamError('zstd compression is not supported')
+
+    async def read_chunk(self, size=READ_SIZE):
+        while not self._eof:
+            data = await self._stream.read_chunk(size)
+
+            if not self._started:
+                # make sure there are enough bytes to detect the format
+                while data and len(data) < MAGIC_SIZE:
+                    more = await self._stream.read_chunk(size)
+                    if not more:
+                        break
+                    data += more
+                self._start(data)
+            if self._encoding == IDENTITY:
+                self._eof = not data
+                return data
+
+            if not data:
+                self._eof = True
+                return self._flush()
+
+            try:
+                data = self._decompress(data)
+            except (OSError, EOFError, zlib.error) as error:
+                raise StreamError(
+                    'Invalid {} content: {}'.format(self._encoding, error)
+                )
+            if data:
+                return data
+
+        return b''
+
+    def _start(self, data):
+        if not self._encoding:
+            self._encoding = next(
+                (
+                    encoding
+                    for magic, encoding in MAGIC_NUMBERS
+                    if data.startswith(magic)
+                ),
+                IDENTITY
+            )
+            if self._encoding == ZSTD and not zstandard:
+                raise StreamError('zstd compression is not supported')
+
+        self._decompressor = self._new_decompressor()
+        self._started = True
+
+    def _new_decompressor(self):
+        if self._encoding == GZIP:
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._encoding == BZIP2:
+            return bz2.BZ2Decompressor()
+        if self._encoding == ZSTD:
+            return zstandard.ZstdDecompressor().decompressobj()
+
+    def _decompress(self, data):
+        # every format may hold several concatenated members or frames
+        if self._decompressor.eof:
+            self._decompressor = self._new_decompressor()
+
+        result = self._decompress_member(data)
+        while self._decompressor.eof and self._decompressor.unused_data:
+            unused_data = self._decompressor.unused_data
+            self._decompressor = self._new_decompressor()
+            result += self._decompress_member(unused_data)
+
+        return result
+
+    def _decompress_member(self, data):
+        if self._encoding != ZSTD:
+            return self._decompressor.decompress(data)
+        try:
+            return self._decompressor.decompress(data)
+        except zstandard.ZstdError as error:
+            raise OSError(str(error))
+
+    def _flush(self):
+        data = b''
+        if self._encoding == GZIP:
+            data = self._decompressor.flush()
+        if not self._decompressor.eof:
+            raise StreamError(
+                'Invalid {} content: truncated file'.format(self._encoding)
+            )
+        return data
+
+
+async def spool(stream, file, read_size=READ_SIZE):
+    """
+    Copy `stream` into `file` chunk by chunk, returning the number of
+    bytes written.
+    """
+    loop = asyncio.get_event_loop()
+    size = 0
+
+    while True:
+        data = await stream.read_chunk(read_size)
+        if not data:
+            break
+        await loop.run_in_executor(None, file.write, data)
+        size += len(data)
+
+    await loop.run_in_executor(None, file.flush)
+    return size
+
+
+async def iter_csv_records(stream, chunk_size, read_size=READ_SIZE,
+                           encoding='utf-8'):
+    """
+    Split a csv byte stream incrementally into raw records, yielding
+    lists of at most `chunk_size` record strings ready for `csv.reader`.
+    A record longer than `csv.field_size_limit()` raises `StreamError`.
+    `stream` must expose an awaitable `read_chunk(size)` returning `b''`
+    when exhausted, such as the aiohttp multipart `BodyPartReader`.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    buffer = ''
+    record = ''
+    quoted = False
+    records = []
+    # `csv.reader` rejects anything longer, so an unterminated quote
+    # doesn't hold the rest of the upload in memory
+    max_record_size = csv.field_size_limit()
+
+    while True:
+        data = await stream.read_chunk(read_size)
+        buffer += decoder.decode(data, final=not data)
+
+        lines = buffer.split('\n')
+        buffer = '' if not data else lines.pop()
+
+        for line in lines:
+            record += line + '\n'
+            # a quoted field may span lines, so the record only ends
+            # with a line that doesn't end inside one
+            if quoted or '"' in line:
+                quoted = _ends_quoted(line, quoted)
+            if not quoted:
+                if record.strip():
+                    records.append(record)
+                record = ''
+
+            if len(records) == chunk_size:
+                yield records
+                records = []
+
+        if len(record) + len(buffer) > max_record_size:
+            raise StreamError(
+                'Invalid csv content: record longer than {} characters'
+                .format(max_record_size)
+            )
+        if not data:
+            break
+
+    if record.strip():
+        records.append(record)
+    if records:
+        yield records
+
+
+def _ends_quoted(line, quoted):
+    """
+    Whether `line` ends inside a quoted field, `quoted` telling whether
+    it starts inside one. As in `csv.reader`, a quote only opens a field
+    when it is its first character, elsewhere it is a plain character.
+    """
+    position = 0
+
+    while position < len(line):
+        if quoted:
+            end = line.find('"', position)
+            if end == -1:
+                return True
+            position = end + 1
+            if line.startswith('"', position):
+                # an escaped quote
+                position += 1
+                continue
+            quoted = False
+        elif line.startswith('"', position):
+            quoted = True
+            position += 1
+            continue
+
+        delimiter = line.find(',', position)
+        if delimiter == -1:
+            return False
+        position = delimiter + 1
+
+    return quoted
+
+
+def parse_csv_records(records):
+    return [row for row in csv.reader(records) if row]
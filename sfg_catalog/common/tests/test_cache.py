@@ -0,0 +1,60 @@
+from sfg_catalog.common.cache import CacheInfo, LRUCache
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+
+    def test_get_and_set(self):
+        cache = LRUCache(2)
+
+        assert cache.get('a') is None
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert cache.info() == CacheInfo(1, 1, 0, 1, 2)
+
+    def test_evict_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+
+        cache.set('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.evictions == 1
+
+    def test_entries_expire(self):
+        clock = Clock()
+        cache = LRUCache(2, ttl=10, clock=clock)
+        cache.set('a', 1)
+
+        clock.now = 9
+        assert cache.get('a') == 1
+
+        clock.now = 10
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_delete_and_clear_change_generation(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        cache.delete('a')
+        assert cache.get('a') is None
+        assert cache.generation == 1
+
+        cache.clear()
+        assert cache.get('b') is None
+        assert cache.generation == 2
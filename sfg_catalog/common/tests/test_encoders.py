@@ -0,0 +1,64 @@
+import datetime
+import json
+
+import pytest
+from bson import BSON, ObjectId
+from bson.raw_bson import RawBSONDocument
+
+from sfg_catalog.common.encoders import decode_raw_documents, json_default
+
+
+def raw(document):
+    return RawBSONDocument(BSON.encode(document))
+
+
+class TestDecodeRawDocuments:
+
+    def test_decode_raw_documents(self):
+        documents = [
+            {'name': 'xpto', 'price': 9.9, 'tags': ['a', 'b']},
+            {'name': 'qwerty', 'count': 2, 'nested': {'value': None}}
+        ]
+
+        assert decode_raw_documents([raw(d) for d in documents]) == documents
+
+    def test_decode_raw_documents_excluding_keys(self):
+        document = {
+            '_id': ObjectId(),
+            'name': 'xpto',
+            'nested': {'_id': 1, 'value': 2},
+            'items': [{'_id': 1, 'value': 3}, 'plain']
+        }
+
+        content = decode_raw_documents([raw(document)], exclude=('_id',))
+
+        assert content == [{
+            'name': 'xpto',
+            'nested': {'value': 2},
+            'items': [{'value': 3}, 'plain']
+        }]
+
+
+class TestJsonDefault:
+
+    def test_json_default(self):
+        object_id = ObjectId()
+        document = {
+            'name': 'x\xfapto',
+            'reference': object_id,
+            'date': datetime.datetime(2019, 5, 1, 10, 30)
+        }
+
+        content = json.dumps(
+            decode_raw_documents([raw(document)]), default=json_default
+        )
+
+        assert json.loads(content) == [{
+            'name': 'x\xfapto',
+            'reference': str(object_id),
+            'date': '2019-05-01T10:30:00'
+        }]
+
+    def test_json_default_not_serializable(self):
+        with pytest.raises(TypeError):
+            json.dumps({'value': {1, 2}}, default=json_default)
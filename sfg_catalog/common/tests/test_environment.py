@@ -0,0 +1,106 @@
+import pytest
+
+from sfg_catalog.common.environment import (
+    ImproperlyConfigured,
+    boolean,
+    comma_separated,
+    load_environment,
+    optional_integer,
+    write_concern
+)
+from sfg_catalog.settings import ENVIRONMENT_DEFAULTS, ENVIRONMENT_SCHEMA
+
+
+class TestLoadEnvironment:
+
+    def test_load_defaults(self):
+        environment = load_environment(
+            ENVIRONMENT_SCHEMA, ENVIRONMENT_DEFAULTS, environ={}
+        )
+
+        assert environment['MOTOR_MAX_POOL_SIZE'] == 100
+        assert environment['MOTOR_MAX_IDLE_TIME_MS'] is None
+        assert environment['MOTOR_COMPRESSORS'] == []
+        assert environment['MOTOR_WRITE_CONCERN'] == 'majority'
+        assert environment['MOTOR_BULK_WRITE_CONCERN'] == 1
+        assert environment['WEB_WORKERS'] > 0
+        assert environment['WEB_LOOP'] == 'uvloop'
+        assert environment['WEB_REUSE_PORT'] is False
+        assert environment['CSV_IMPORT_PROCESSES'] == 0
+
+    def test_load_from_environ(self):
+        environment = load_environment(
+            ENVIRONMENT_SCHEMA, ENVIRONMENT_DEFAULTS, environ={
+                'MOTOR_MIN_POOL_SIZE': '5',
+                'MOTOR_MAX_POOL_SIZE': '50',
+                'MOTOR_WAIT_QUEUE_TIMEOUT_MS': '1000',
+                'MOTOR_COMPRESSORS': 'zstd, zlib',
+                'MOTOR_LIST_READ_PREFERENCE': 'secondaryPreferred',
+                'MOTOR_BULK_WRITE_CONCERN': '2',
+                'WEB_WORKERS': '4',
+                'WEB_KEEPALIVE': '30',
+                'WEB_REUSE_PORT': 'true',
+                'CSV_IMPORT_PROCESSES': '2'
+            }
+        )
+
+        assert environment['MOTOR_MIN_POOL_SIZE'] == 5
+        assert environment['MOTOR_MAX_POOL_SIZE'] == 50
+        assert environment['MOTOR_WAIT_QUEUE_TIMEOUT_MS'] == 1000
+        assert environment['MOTOR_COMPRESSORS'] == ['zstd', 'zlib']
+        assert environment['MOTOR_LIST_READ_PREFERENCE'] == (
+            'secondaryPreferred'
+        )
+        assert environment['MOTOR_BULK_WRITE_CONCERN'] == 2
+        assert environment['WEB_WORKERS'] == 4
+        assert environment['WEB_KEEPALIVE'] == 30
+        assert environment['WEB_REUSE_PORT'] is True
+        assert environment['CSV_IMPORT_PROCESSES'] == 2
+
+    @pytest.mark.parametrize('environ,error_message', [
+        ({'MOTOR_URI': ''}, 'MOTOR_URI should not be empty'),
+        ({'MOTOR_MAX_POOL_SIZE': '0'},
+         'MOTOR_MAX_POOL_SIZE should be greater than 0'),
+        ({'MOTOR_MAX_POOL_SIZE': 'xpto'},
+         'MOTOR_MAX_POOL_SIZE should be greater than 0'),
+        ({'MOTOR_MAX_IDLE_TIME_MS': '-1'},
+         'MOTOR_MAX_IDLE_TIME_MS should be greater than 0'),
+        ({'MOTOR_COMPRESSORS': 'lz4'},
+         'MOTOR_COMPRESSORS should be some of snappy, zlib, zstd'),
+        ({'MOTOR_LIST_READ_PREFERENCE': 'secondaries'},
+         'MOTOR_LIST_READ_PREFERENCE should be one of primary, '
+         'primaryPreferred, secondary, secondaryPreferred, nearest'),
+        ({'MOTOR_WRITE_CONCERN': '0'},
+         'MOTOR_WRITE_CONCERN should be majority or greater than 0'),
+        ({'MOTOR_WRITE_CONCERN': '-1'},
+         'MOTOR_WRITE_CONCERN should be majority or greater than 0'),
+        ({'MOTOR_BULK_WRITE_CONCERN': '0'},
+         'MOTOR_BULK_WRITE_CONCERN should be majority or greater than 0'),
+        ({'MOTOR_BULK_WRITE_CONCERN': '-1'},
+         'MOTOR_BULK_WRITE_CONCERN should be majority or greater than 0'),
+        ({'WEB_WORKERS': '0'}, 'WEB_WORKERS should be greater than 0'),
+        ({'WEB_LOOP': 'tokio'}, 'WEB_LOOP should be one of uvloop, asyncio'),
+        ({'WEB_REUSE_PORT': 'maybe'},
+         'WEB_REUSE_PORT should be true or false'),
+        ({'CSV_IMPORT_PROCESSES': '-1'},
+         'CSV_IMPORT_PROCESSES should be 0 or greater')
+    ])
+    def test_load_invalid_environ(self, environ, error_message):
+        with pytest.raises(ImproperlyConfigured) as error:
+            load_environment(
+                ENVIRONMENT_SCHEMA, ENVIRONMENT_DEFAULTS, environ=environ
+            )
+
+        assert str(error.value) == 'Invalid settings: {}'.format(
+            error_message
+        )
+
+    def test_converters(self):
+        assert optional_integer('') is None
+        assert optional_integer('10') == 10
+        assert comma_separated(' a,,b ') == ['a', 'b']
+        assert write_concern('majority') == 'majority'
+        assert write_concern('2') == 2
+        assert boolean('Yes') is True
+        assert boolean('') is False
+        assert boolean(False) is False
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from sfg_catalog.common.invalidation import InvalidationBus
+
+
+async def wait_for(condition, timeout=5):
+    for _ in range(int(timeout / 0.05)):
+        if condition():
+            return
+        await asyncio.sleep(0.05)
+
+
+class TestInvalidationBus:
+
+    @pytest.mark.parametrize('tailing', [True, False])
+    async def test_publish_to_every_worker(self, client, tailing):
+        received, other_received = [], []
+        bus = InvalidationBus(poll_interval=0.05)
+        other_bus = InvalidationBus(poll_interval=0.05)
+        other_bus.tailing = tailing
+        bus.subscribe('resources', received.append)
+        other_bus.subscribe('resources', other_received.append)
+        other_bus.subscribe('import_jobs', other_received.append)
+
+        await bus.start()
+        await other_bus.start()
+        try:
+            bus.publish('resources', ('a', 'b'))
+            bus.publish('resources')
+            await wait_for(lambda: len(other_received) == 2)
+        finally:
+            await bus.close()
+            await other_bus.close()
+
+        assert received == [['a', 'b'], None]
+        assert other_received == [['a', 'b'], None]
+
+    async def test_publish_ignores_subscriber_failures(self, client):
+        received = []
+        bus = InvalidationBus()
+
+        def fail(keys):
+            raise ValueError(keys)
+
+        bus.subscribe('resources', fail)
+        bus.subscribe('resources', received.append)
+        bus.publish('resources', ['a'])
+
+        assert received == [['a']]
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from sfg_catalog.common.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+
+    async def test_concurrent_calls_share_the_result(self, client):
+        flights = SingleFlight()
+        calls = []
+
+        async def load(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flights.do('a', lambda: load(1)),
+            flights.do('a', lambda: load(2)),
+            flights.do('b', lambda: load(3))
+        )
+
+        assert results == [1, 1, 3]
+        assert calls == [1, 3]
+        assert len(flights) == 0
+
+    async def test_calls_after_the_flight_run_again(self, client):
+        flights = SingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            return len(calls)
+
+        assert await flights.do('a', load) == 1
+        assert await flights.do('a', load) == 2
+
+    async def test_exceptions_are_shared(self, client):
+        flights = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.01)
+            raise ValueError('xpto')
+
+        results = await asyncio.gather(
+            flights.do('a', load),
+            flights.do('a', load),
+            return_exceptions=True
+        )
+
+        assert [str(result) for result in results] == ['xpto', 'xpto']
+        assert len(flights) == 0
+
+    async def test_cancelled_caller_does_not_cancel_the_call(self, client):
+        flights = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.01)
+            return 1
+
+        first = asyncio.ensure_future(flights.do('a', load))
+        second = asyncio.ensure_future(flights.do('a', load))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == 1
+        with pytest.raises(asyncio.CancelledError):
+            await first
@@ -0,0 +1,151 @@
+import bz2
+import gzip
+import io
+
+import pytest
+import zstandard
+
+from sfg_catalog.common.streams import (
+    DecompressingStream,
+    StreamError,
+    iter_csv_records,
+    parse_csv_records
+)
+
+
+class BytesStream:
+
+    def __init__(self, content, read_size=None):
+        self._content = io.BytesIO(content)
+        self._read_size = read_size
+
+    async def read_chunk(self, size):
+        return self._content.read(self._read_size or size)
+
+
+async def read_all(stream):
+    content = b''
+    while True:
+        data = await stream.read_chunk(16)
+        if not data:
+            return content
+        content += data
+
+
+class TestIterCsvRecords:
+
+    @pytest.mark.parametrize('read_size', [1, 3, 1024])
+    async def test_iter_csv_records_in_chunks(self, read_size):
+        content = 'a,b\r\n"x,\ny",\xfa\n\n1,2\n3,"4""q"'.encode()
+
+        chunks = [
+            parse_csv_records(records)
+            async for records in iter_csv_records(
+                BytesStream(content, read_size), chunk_size=2
+            )
+        ]
+
+        assert chunks == [
+            [['a', 'b'], ['x,\ny', '\xfa']],
+            [['1', '2'], ['3', '4"q']]
+        ]
+
+    async def test_quote_inside_unquoted_field_is_a_plain_character(self):
+        content = b'1,Monitor 27" LG,2\n3,4\n5,"6""\n7",8\n9,10'
+
+        chunks = [
+            parse_csv_records(records)
+            async for records in iter_csv_records(
+                BytesStream(content), chunk_size=10
+            )
+        ]
+
+        assert chunks == [[
+            ['1', 'Monitor 27" LG', '2'], ['3', '4'],
+            ['5', '6"\n7', '8'], ['9', '10']
+        ]]
+
+    async def test_record_too_long(self):
+        content = b'1,"unterminated\n' + b'2,3\n' * 100000
+
+        with pytest.raises(StreamError) as error:
+            async for _ in iter_csv_records(
+                BytesStream(content), chunk_size=10
+            ):
+                pass
+
+        assert str(error.value) == (
+            'Invalid csv content: record longer than 131072 characters'
+        )
+
+
+class TestDecompressingStream:
+
+    content = b'1111,dafiti,buscape\n' * 500
+
+    @pytest.mark.parametrize('compress', [
+        gzip.compress,
+        bz2.compress,
+        zstandard.ZstdCompressor().compress,
+        lambda content: content
+    ])
+    @pytest.mark.parametrize('read_size', [1, 100, 1024 * 1024])
+    async def test_detects_compression_by_magic_number(
+        self,
+        compress,
+        read_size
+    ):
+        stream = DecompressingStream(
+            BytesStream(compress(self.content), read_size)
+        )
+
+        assert await read_all(stream) == self.content
+
+    @pytest.mark.parametrize('compress', [
+        gzip.compress,
+        bz2.compress,
+        zstandard.ZstdCompressor().compress
+    ])
+    @pytest.mark.parametrize('read_size', [1, 1024 * 1024])
+    async def test_decompresses_concatenated_members(
+        self,
+        compress,
+        read_size
+    ):
+        stream = DecompressingStream(BytesStream(
+            compress(self.content[:333]) + compress(self.content[333:]),
+            read_size
+        ))
+
+        assert await read_all(stream) == self.content
+
+    async def test_uses_content_encoding(self):
+        stream = DecompressingStream(
+            BytesStream(gzip.compress(self.content)), 'x-gzip'
+        )
+
+        assert await read_all(stream) == self.content
+
+    async def test_unsupported_content_encoding(self):
+        with pytest.raises(StreamError) as error:
+            DecompressingStream(BytesStream(b''), 'br')
+
+        assert str(error.value) == 'Unsupported content encoding br'
+
+    @pytest.mark.parametrize('compress,encoding', [
+        (gzip.compress, 'gzip'),
+        (bz2.compress, 'bzip2'),
+        (zstandard.ZstdCompressor().compress, 'zstd')
+    ])
+    async def test_truncated_content(self, compress, encoding):
+        content = compress(self.content)
+        stream = DecompressingStream(
+            BytesStream(content[:len(content) // 2])
+        )
+
+        with pytest.raises(StreamError) as error:
+            await read_all(stream)
+
+        assert str(error.value) == (
+            'Invalid {} content: truncated file'.format(encoding)
+        )
@@ -0,0 +1,116 @@
+import pytest
+from schema import (
+    And,
+    Forbidden,
+    Optional,
+    Or,
+    Regex,
+    Schema,
+    SchemaError,
+    Use
+)
+
+from sfg_catalog.common.validators import CompiledSchema
+
+schema = Schema({
+    Optional('_id'): Use(str),
+    'name': str,
+    'amount': And(
+        Use(float),
+        lambda value: value > 0,
+        error='Amount should be greater than 0'
+    ),
+    Optional('count', default=0): int,
+    Optional('status', default='new'): Or('new', 'done'),
+    Optional('note', default=None): Or(None, str),
+    Optional('tags', default=list): [str],
+    Optional('code'): Regex(r'^\d+$')
+}, ignore_extra_keys=True)
+
+valid = {'name': 'xpto', 'amount': '9.9'}
+
+
+def validate(schema, data, **kwargs):
+    try:
+        return schema.validate(data, **kwargs), None
+    except SchemaError as error:
+        return None, (error.code, error.autos, error.errors)
+
+
+class TestCompiledSchema:
+
+    @pytest.mark.parametrize('data', [
+        valid,
+        dict(valid, _id=123, extra=True),
+        dict(valid, count=3, status='done', note='x', tags=['a', 'b']),
+        dict(valid, code='123'),
+        {},
+        {'name': 'xpto'},
+        dict(valid, name=1),
+        dict(valid, amount='xpto'),
+        dict(valid, amount=-1),
+        dict(valid, amount=None),
+        dict(valid, count=True),
+        dict(valid, count='1'),
+        dict(valid, status='xpto'),
+        dict(valid, note=1),
+        dict(valid, tags='a'),
+        dict(valid, tags=['a', 1]),
+        dict(valid, code='a1'),
+        'xpto',
+        None
+    ])
+    def test_validate_like_the_schema(self, data):
+        compiled = CompiledSchema(schema)
+
+        assert compiled._validate
+        assert validate(compiled, data) == validate(schema, data)
+
+    def test_validate_without_ignoring_extra_keys(self):
+        strict_schema = Schema({'name': str})
+        compiled = CompiledSchema(strict_schema)
+
+        data = {'name': 'xpto', 'extra': 1}
+
+        assert validate(compiled, data) == validate(strict_schema, data)
+
+    def test_validate_unsupported_schema(self):
+        unsupported_schema = Schema({
+            'name': str,
+            Forbidden('age'): int
+        })
+        compiled = CompiledSchema(unsupported_schema)
+
+        data = {'name': 'xpto', 'age': 1}
+
+        assert compiled._validate is None
+        assert validate(compiled, data) == validate(unsupported_schema, data)
+
+    def test_validate_many(self):
+        compiled = CompiledSchema(schema)
+
+        results = compiled.validate_many([valid, dict(valid, amount=0)])
+
+        assert results[0] == (schema.validate(valid), None)
+        assert results[1][0] is None
+        assert results[1][1].code == 'Amount should be greater than 0'
+
+    @pytest.mark.parametrize('data', [
+        {},
+        {'amount': '9.9'},
+        {'name': 'xpto', 'count': 3},
+        {'amount': 0},
+        {'name': 1},
+        {'status': 'xpto'},
+        'xpto'
+    ])
+    def test_validate_partial(self, data):
+        compiled = CompiledSchema(schema)
+        partial_schema = Schema({
+            Optional(key): value for key, value in schema._schema.items()
+            if (key._schema if isinstance(key, Optional) else key) in data
+        }, ignore_extra_keys=True) if isinstance(data, dict) else schema
+
+        expected = validate(partial_schema, data)
+
+        assert validate(compiled, data, partial=True) == expected
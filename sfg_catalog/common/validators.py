@@ -0,0 +1,243 @@
+from schema import And, Hook, Optional, Or, Schema, SchemaError, Use
+
+
+class _Invalid(Exception):
+    pass
+
+
+class _Unsupported(Exception):
+    pass
+
+
+class CompiledSchema:
+    """
+    A dict `schema.Schema` compiled once into plain closures, so valid
+    data doesn't pay for the generic interpretation of the spec on every
+    call. The compiled path only decides whether the data is valid: when
+    it isn't, the original schema validates it again to raise the very
+    same `SchemaError`. Specs it doesn't know how to compile are left to
+    the original schema.
+
+    It reads the internals of `schema` 0.7.0 (`_schema`, `_args`,
+    `_callable`), keep that in mind when upgrading it.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        try:
+            self._validate = _compile_dict(schema)
+            self._validate_partial = _compile_dict(schema, partial=True)
+        except _Unsupported:
+            self._validate = None
+            self._validate_partial = None
+
+    def validate(self, data, partial=False):
+        """
+        Validate `data` against the schema. When `partial`, only the keys
+        present in `data` are validated, missing ones are neither
+        required nor filled with their defaults.
+        """
+        validate = self._validate_partial if partial else self._validate
+        if validate:
+            try:
+                return validate(data)
+            except _Invalid:
+                pass
+
+        if partial and isinstance(data, dict):
+            return self._partial_schema(data).validate(data)
+        return self.schema.validate(data)
+
+    def _partial_schema(self, data):
+        spec = {}
+        for key, value in self.schema._schema.items():
+            name = key._schema if isinstance(key, Optional) else key
+            if name in data:
+                spec[Optional(name)] = value
+
+        return Schema(
+            spec, ignore_extra_keys=self.schema._ignore_extra_keys
+        )
+
+    def validate_many(self, items):
+        """
+        Validate many items at once, returning a `(data, error)` pair for
+        each of them, in order, where only one of both is set.
+        """
+        validate = self.validate
+        results = []
+
+        for item in items:
+            try:
+                results.append((validate(item), None))
+            except SchemaError as error:
+                results.append((None, error))
+
+        return results
+
+
+def _compile_dict(schema, partial=False):
+    spec = schema._schema
+    if type(spec) is not dict:
+        raise _Unsupported
+
+    fields = {}
+    required = set()
+    defaults = []
+
+    for key, value in spec.items():
+        if isinstance(key, Hook):
+            raise _Unsupported
+        if isinstance(key, Optional):
+            name = key._schema
+            if hasattr(key, 'default'):
+                defaults.append((name, key.default))
+        elif isinstance(key, Schema):
+            raise _Unsupported
+        else:
+            name = key
+            required.add(name)
+
+        if not isinstance(name, str):
+            raise _Unsupported
+        fields[name] = _compile(value)
+
+    ignore_extra_keys = schema._ignore_extra_keys
+    required_count = len(required)
+
+    def validate(data):
+        if not isinstance(data, dict):
+            raise _Invalid
+
+        new = type(data)()
+        found = 0
+
+        for key, value in data.items():
+            validator = fields.get(key)
+            if validator is None:
+                continue
+            new[key] = validator(value)
+            if key in required:
+                found += 1
+
+        if not ignore_extra_keys and len(new) != len(data):
+            raise _Invalid
+        if partial:
+            return new
+        if found != required_count:
+            raise _Invalid
+
+        for name, default in defaults:
+            if name not in new:
+                new[name] = default() if callable(default) else default
+
+        return new
+
+    return validate
+
+
+def _compile(spec):
+    if type(spec) is list:
+        return _compile_list(spec)
+    if type(spec) in (dict, tuple, set, frozenset):
+        raise _Unsupported
+    if isinstance(spec, type):
+        return _compile_type(spec)
+    if type(spec) in (And, Or) and spec._schema is Schema:
+        if isinstance(spec, Or):
+            if spec.only_one:
+                return _compile_validator(spec)
+            return _compile_or([_compile(s) for s in spec._args])
+        return _compile_and([_compile(s) for s in spec._args])
+    if type(spec) is Use:
+        return _compile_use(spec._callable)
+    if hasattr(spec, 'validate'):
+        return _compile_validator(spec)
+    if callable(spec):
+        return _compile_callable(spec)
+    return _compile_comparable(spec)
+
+
+def _compile_type(spec):
+    def validate(value):
+        if isinstance(value, spec) and not (
+            isinstance(value, bool) and spec is int
+        ):
+            return value
+        raise _Invalid
+
+    return validate
+
+
+def _compile_list(spec):
+    validate_item = _compile_or([_compile(s) for s in spec])
+
+    def validate(value):
+        if not isinstance(value, list):
+            raise _Invalid
+        return type(value)(validate_item(item) for item in value)
+
+    return validate
+
+
+def _compile_and(validators):
+    def validate(value):
+        for validator in validators:
+            value = validator(value)
+        return value
+
+    return validate
+
+
+def _compile_or(validators):
+    def validate(value):
+        for validator in validators:
+            try:
+                return validator(value)
+            except _Invalid:
+                pass
+        raise _Invalid
+
+    return validate
+
+
+def _compile_use(function):
+    def validate(value):
+        try:
+            return function(value)
+        except Exception:
+            raise _Invalid
+
+    return validate
+
+
+def _compile_callable(function):
+    def validate(value):
+        try:
+            result = function(value)
+        except Exception:
+            raise _Invalid
+        if not result:
+            raise _Invalid
+        return value
+
+    return validate
+
+
+def _compile_comparable(spec):
+    def validate(value):
+        if spec == value:
+            return value
+        raise _Invalid
+
+    return validate
+
+
+def _compile_validator(spec):
+    def validate(value):
+        try:
+            return spec.validate(value)
+        except Exception:
+            raise _Invalid
+
+    return validate
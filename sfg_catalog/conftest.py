@@ -1,9 +1,14 @@
+import asyncio
+
 import pytest
 
-from sfg_catalog import app as _app
-from sfg_catalog import loop as _loop
+from sfg_catalog.main import build_app, get_models, setup_indexes
 from sfg_catalog.resources.helpers import generate_resource_id
 from sfg_catalog.resources.models import ResourceModel
+from sfg_catalog.settings import INVALIDATION_BUS_COLLECTION
+
+_loop = asyncio.get_event_loop()
+_app = build_app(loop=_loop)
 
 
 @pytest.fixture(scope='session')
@@ -37,10 +42,18 @@ async def clean_db(loop, mongo_db, run_sync):
     collections = await mongo_db.list_collection_names()
 
     for collection in collections:
-        if collection.startswith('system'):
+        # the invalidation bus of the running app tails it
+        if collection.startswith('system') or (
+            collection == INVALIDATION_BUS_COLLECTION
+        ):
             continue
         await mongo_db.drop_collection(collection)
 
+    for model in get_models():
+        model.clear_cache()
+
+    await setup_indexes()
+
     return mongo_db
 
 
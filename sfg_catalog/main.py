@@ -1,19 +1,34 @@
+import asyncio
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 import aiohttp_jinja2
 import jinja2
 from aiohttp import web
 from aiohttp_swagger import setup_swagger
 
+from .common.invalidation import InvalidationBus
+from .common.models import BaseModel
 from .common.mongo import Mongo
 from .middlewares import error_middleware
+from .resources.jobs import ImportJobManager
+from .resources.models import ImportJobModel, ResourceModel
 from .resources.routes import resources_routes
-from .settings import LOGGING, TEMPLATES_DIR
+from .settings import (
+    CSV_IMPORT_PROCESSES,
+    IMPORT_JOB_DRAIN_TIMEOUT,
+    LOGGING,
+    TEMPLATES_DIR
+)
+
+log = logging.getLogger(__name__)
 
 
 def build_app(loop=None):
     app = web.Application(loop=loop, middlewares=get_middlewares())
     app.on_startup.append(load_plugins)
+    app.on_shutdown.append(drain_import_jobs)
     app.on_cleanup.append(cleanup_plugins)
     aiohttp_jinja2.setup(app, loader=jinja2.FileSystemLoader(TEMPLATES_DIR))
     register_routes(app)
@@ -29,6 +44,15 @@ def build_app(loop=None):
     return app
 
 
+async def create_app():
+    """
+    App factory for gunicorn, awaited by the aiohttp worker once its
+    loop is running, so every forked worker builds its own app on the
+    loop it picked.
+    """
+    return build_app()
+
+
 def setup_logging():
     logging.config.dictConfig(LOGGING)
 
@@ -41,11 +65,83 @@ def get_middlewares():
     return [error_middleware]
 
 
+def get_models():
+    return [ResourceModel, ImportJobModel]
+
+
+async def setup_indexes():
+    for model in get_models():
+        try:
+            await model.ensure_indexes()
+            report = await model.index_report()
+        except Exception as e:
+            log.exception('Fail to ensure indexes of {}: {}'.format(
+                model.__name__, e
+            ))
+            continue
+
+        for status, indexes in report.items():
+            if indexes:
+                # every index is unused right after the server starts
+                level = logging.INFO if status == 'unused' else logging.WARNING
+                log.log(level, '{} indexes of collection "{}": {}'.format(
+                    status.capitalize(), model.collection_name, indexes
+                ))
+
+
+async def setup_invalidation_bus():
+    bus = InvalidationBus()
+    await bus.start()
+
+    for model in get_models():
+        bus.subscribe(model.collection_name, model.evict)
+    BaseModel.invalidation_bus = bus
+
+    return bus
+
+
+def build_import_executor():
+    if not CSV_IMPORT_PROCESSES:
+        return None
+    # the pool forks its processes lazily, once the mongo client threads
+    # and the loop already run, which isn't fork safe: they are forked
+    # from a clean server process instead
+    return ProcessPoolExecutor(
+        CSV_IMPORT_PROCESSES,
+        mp_context=multiprocessing.get_context('forkserver')
+    )
+
+
 async def load_plugins(app):
+    app.import_executor = build_import_executor()
     app.mongo = Mongo()
     app.mongo.initialize(app._loop)
+    await setup_indexes()
+    app.invalidation_bus = await setup_invalidation_bus()
+    app.import_jobs = ImportJobManager(executor=app.import_executor)
+    app.import_jobs_drain = None
+
+
+async def drain_import_jobs(app):
+    # called once the server stops listening, but before it waits for the
+    # in-flight requests: draining meanwhile keeps the whole shutdown
+    # within the graceful timeout. The jobs still running afterwards are
+    # interrupted on cleanup
+    if app.import_jobs:
+        app.import_jobs_drain = asyncio.ensure_future(
+            app.import_jobs.drain(IMPORT_JOB_DRAIN_TIMEOUT)
+        )
 
 
 async def cleanup_plugins(app):
+    if app.import_jobs_drain:
+        await app.import_jobs_drain
+    if app.import_jobs:
+        await app.import_jobs.close()
+    if app.import_executor:
+        app.import_executor.shutdown()
+    if app.invalidation_bus:
+        BaseModel.invalidation_bus = None
+        await app.invalidation_bus.close()
     if app.mongo:
         app.mongo.close()
@@ -1,4 +1,13 @@
+NOT_EDITABLE_FIELDS = ('_id', 'id', 'sku', 'seller', 'campaign_code')
 
 
 def generate_resource_id(sku, seller, campaign_code):
     return '{}-{}-{}'.format(sku, seller, campaign_code)
+
+
+def clean_not_editable_fields(payload):
+    return {
+        k: v
+        for k, v in payload.items()
+        if k not in NOT_EDITABLE_FIELDS
+    }
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from collections import namedtuple
+
+from sfg_catalog.common.streams import iter_csv_records, parse_csv_records
+from sfg_catalog.settings import (
+    CSV_IMPORT_CHUNK_SIZE,
+    CSV_IMPORT_PROCESSES,
+    CSV_IMPORT_QUEUE_SIZE,
+    CSV_IMPORT_WRITERS
+)
+
+from .helpers import generate_resource_id
+from .models import ResourceModel
+
+log = logging.getLogger(__name__)
+
+Resource = namedtuple(
+    'Resource',
+    (
+        'sku', 'seller', 'campaign_code', 'product_name', 'brand',
+        'category', 'subcategory', 'size', 'list_price', 'price'
+    )
+)
+
+
+def prepare_resources(records):
+    """
+    Parse and validate a chunk of csv records, returning the number of
+    rows, the `(data, resource_payload)` pairs ready to be written and
+    the failure messages. It may run in a worker process, so it only
+    takes and returns picklable values.
+    """
+    resources = []
+    resources_failed = []
+    rows = parse_csv_records(records)
+
+    resources_data = [
+        Resource(*row) if len(row) == len(Resource._fields) else None
+        for row in rows
+    ]
+    results = iter(ResourceModel.validator.validate_many(
+        data._asdict() for data in resources_data if data
+    ))
+
+    for row, data in zip(rows, resources_data):
+        if not data:
+            resources_failed.append(
+                _failure_message(row, 'Invalid number of columns')
+            )
+            continue
+
+        resource_payload, error = next(results)
+        if error:
+            resources_failed.append(_failure_message(data, error.code))
+            continue
+
+        resources.append((data, _prepare_resource(data, resource_payload)))
+
+    return len(rows), resources, resources_failed
+
+
+def _prepare_resource(data, resource_payload):
+    resource_payload['id'] = generate_resource_id(
+        data.sku, data.seller, data.campaign_code
+    )
+
+    # recalculates resource price
+    resource_payload['price'] = float(format(
+        (resource_payload['list_price'] - resource_payload['price']) * 1.1,
+        '.2f'
+    ))
+
+    return resource_payload
+
+
+def _failure_message(data, reason):
+    return 'Fail to create or update {}, reason: {}'.format(data, reason)
+
+
+class ResourceImporter:
+    """
+    Imports resources from a csv stream through a staged pipeline:
+    parse -> validate -> write. Stages are connected by bounded queues,
+    so a slow write path applies backpressure all the way up to the
+    upload, and at most `writers` bulk writes are in flight at once.
+
+    When an `executor` is given, parsing and validation of the chunks
+    run on it, `CSV_IMPORT_PROCESSES` chunks at a time, instead of on
+    the loop.
+    """
+
+    def __init__(
+        self,
+        chunk_size=CSV_IMPORT_CHUNK_SIZE,
+        queue_size=CSV_IMPORT_QUEUE_SIZE,
+        writers=CSV_IMPORT_WRITERS,
+        executor=None,
+        on_progress=None
+    ):
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.writers = writers
+        self.executor = executor
+        self.validators = max(CSV_IMPORT_PROCESSES, 1) if executor else 1
+        self.on_progress = on_progress
+        self.rows_processed = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.resources_failed = []
+        self._validators_running = 0
+
+    async def run(self, stream):
+        records_queue = asyncio.Queue(maxsize=self.queue_size)
+        resources_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._validators_running = self.validators
+
+        tasks = [
+            asyncio.ensure_future(self._parse(stream, records_queue))
+        ] + [
+            asyncio.ensure_future(
+                self._validate(records_queue, resources_queue)
+            )
+            for _ in range(self.validators)
+        ] + [
+            asyncio.ensure_future(self._write(resources_queue))
+            for _ in range(self.writers)
+        ]
+
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        log.info(
+            'Resources import finished: {} created, {} updated, '
+            '{} skipped, {} failed'.format(
+                self.created, self.updated, self.skipped,
+                len(self.resources_failed)
+            )
+        )
+        return self.resources_failed
+
+    def report(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'skipped': self.skipped
+        }
+
+    async def _parse(self, stream, records_queue):
+        async for records in iter_csv_records(stream, self.chunk_size):
+            await records_queue.put(records)
+
+        for _ in range(self.validators):
+            await records_queue.put(None)
+
+    async def _validate(self, records_queue, resources_queue):
+        while True:
+            records = await records_queue.get()
+            if records is None:
+                break
+
+            rows, resources, resources_failed = (
+                await self._prepare_resources(records)
+            )
+            self.resources_failed.extend(resources_failed)
+            self.rows_processed += rows - len(resources)
+
+            await resources_queue.put(resources)
+
+        # the last validator to finish releases the writers
+        self._validators_running -= 1
+        if not self._validators_running:
+            for _ in range(self.writers):
+                await resources_queue.put(None)
+
+    async def _prepare_resources(self, records):
+        if self.executor:
+            return await asyncio.get_event_loop().run_in_executor(
+                self.executor, prepare_resources, records
+            )
+
+        result = prepare_resources(records)
+        # validation is cpu bound, give other requests a turn
+        await asyncio.sleep(0)
+        return result
+
+    async def _write(self, resources_queue):
+        while True:
+            resources = await resources_queue.get()
+            if resources is None:
+                break
+
+            result = await ResourceModel._bulk_create_or_update(
+                [resource_payload for _, resource_payload in resources]
+            )
+            self.created += result.created
+            self.updated += result.updated
+            self.skipped += result.skipped
+            self.resources_failed.extend(
+                _failure_message(resources[index][0], reason)
+                for index, reason in result.failures
+            )
+            self.rows_processed += len(resources)
+
+            if self.on_progress:
+                await self.on_progress(self)
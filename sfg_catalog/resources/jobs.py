@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+from sfg_catalog.common.streams import DecompressingStream, FileStream, spool
+from sfg_catalog.settings import (
+    IMPORT_JOB_MAX_FAILURES,
+    IMPORT_JOB_PROGRESS_INTERVAL,
+    IMPORT_JOB_SPOOL_DIR
+)
+
+from .importer import ResourceImporter
+from .models import ImportJobModel
+
+log = logging.getLogger(__name__)
+
+
+class ImportJobManager:
+    """
+    Runs csv imports in background tasks. The upload is spooled, still
+    compressed, to a temporary file so the request can be answered right
+    away, and the job progress is kept in mongo so any worker can report
+    it.
+    """
+
+    def __init__(self, executor=None):
+        self.executor = executor
+        self._tasks = set()
+
+    async def start(self, csv_file, content_encoding=None):
+        spool_file = tempfile.NamedTemporaryFile(
+            prefix='csv_import_', dir=IMPORT_JOB_SPOOL_DIR, delete=False
+        )
+        try:
+            bytes_total = await spool(csv_file, spool_file)
+            spool_file.close()
+
+            job = ImportJobModel(
+                job_id=uuid.uuid4().hex,
+                status=ImportJobModel.PENDING,
+                bytes_total=bytes_total
+            )
+            await self._save(job)
+        except Exception:
+            spool_file.close()
+            os.remove(spool_file.name)
+            raise
+
+        task = asyncio.ensure_future(
+            self._run(job, spool_file.name, content_encoding)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        return job
+
+    async def drain(self, timeout):
+        """
+        Wait up to `timeout` seconds for the running jobs to finish, so a
+        worker being stopped doesn't interrupt its imports. Returns how
+        many jobs are still running.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+
+        # requests still in flight may start new jobs meanwhile
+        while self._tasks and loop.time() < deadline:
+            log.info('Waiting for {} import jobs to finish'.format(
+                len(self._tasks)
+            ))
+            await asyncio.wait(
+                set(self._tasks), timeout=deadline - loop.time()
+            )
+
+        if self._tasks:
+            log.warning('{} import jobs will be interrupted'.format(
+                len(self._tasks)
+            ))
+        return len(self._tasks)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, job, path, content_encoding):
+        try:
+            await self._import(job, path, content_encoding)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            # saving the job failed, a job left pending or running is
+            # reported failed once its heartbeat goes stale
+            log.exception('Import job "{}" failed: {}'.format(
+                job['job_id'], error
+            ))
+        finally:
+            os.remove(path)
+
+    async def _import(self, job, path, content_encoding):
+        log.info('Starting import job "{}"'.format(job['job_id']))
+
+        job['status'] = ImportJobModel.RUNNING
+        job['started_at'] = time.time()
+        await self._save(job)
+
+        csv_file = open(path, 'rb')
+        stream = FileStream(csv_file)
+        last_progress = job['started_at']
+
+        async def on_progress(importer):
+            nonlocal last_progress
+            if time.time() - last_progress < IMPORT_JOB_PROGRESS_INTERVAL:
+                return
+            last_progress = time.time()
+            self._update_progress(job, importer, stream)
+            await self._save(job)
+
+        importer = ResourceImporter(
+            executor=self.executor, on_progress=on_progress
+        )
+
+        try:
+            await importer.run(
+                DecompressingStream(stream, content_encoding)
+            )
+        except asyncio.CancelledError:
+            job['status'] = ImportJobModel.FAILED
+            job['error'] = 'Import interrupted'
+            raise
+        except Exception as error:
+            log.exception('Import job "{}" failed: {}'.format(
+                job['job_id'], error
+            ))
+            job['status'] = ImportJobModel.FAILED
+            job['error'] = str(error)
+        else:
+            job['status'] = ImportJobModel.FINISHED
+        finally:
+            csv_file.close()
+            job['finished_at'] = time.time()
+            self._update_progress(job, importer, stream)
+            await self._save(job)
+
+        log.info('Import job "{}" {} with {} failures'.format(
+            job['job_id'], job['status'], job['rows_failed']
+        ))
+
+    async def _save(self, job):
+        job['heartbeat_at'] = time.time()
+        await job.save()
+
+    def _update_progress(self, job, importer, stream):
+        job['bytes_read'] = stream.bytes_read
+        job['rows_processed'] = importer.rows_processed
+        job.update(importer.report())
+        job['rows_failed'] = len(importer.resources_failed)
+        job['resources_failed'] = (
+            importer.resources_failed[:IMPORT_JOB_MAX_FAILURES]
+        )
@@ -1,12 +1,55 @@
-from schema import And, Optional, Schema, Use
+from pymongo import ASCENDING, TEXT, IndexModel
+from schema import And, Optional, Or, Schema, Use
 
-from sfg_catalog.common.models import BaseModel
+from sfg_catalog.common.models import BaseModel, Record
+from sfg_catalog.settings import RESOURCE_CACHE_SIZE, RESOURCE_LIST_CACHE_SIZE
+
+RESOURCE_FIELDS = (
+    'id', 'sku', 'seller', 'campaign_code', 'product_name', 'brand',
+    'category', 'subcategory', 'size', 'list_price', 'price'
+)
+
+
+class ResourceRecord(Record):
+
+    __slots__ = ('_id',) + RESOURCE_FIELDS
 
 
 class ResourceModel(BaseModel):
 
     collection_name = 'resources'
 
+    searchable_fields = (
+        'sku', 'seller', 'campaign_code', 'product_name', 'brand', 'size',
+        'category', 'subcategory'
+    )
+
+    indexes = (
+        IndexModel([('id', ASCENDING)], name='id_unique', unique=True),
+        IndexModel(
+            [('product_name', TEXT), ('brand', TEXT)],
+            name='product_name_brand_text',
+            default_language='portuguese'
+        )
+    ) + tuple(
+        IndexModel([(field, ASCENDING)], name='{}_1'.format(field))
+        for field in searchable_fields
+    )
+
+    projection_fields = RESOURCE_FIELDS
+
+    record_class = ResourceRecord
+
+    cache_size = RESOURCE_CACHE_SIZE
+    list_cache_size = RESOURCE_LIST_CACHE_SIZE
+
+    versioned = True
+
+    fingerprint_fields = (
+        'product_name', 'brand', 'category', 'subcategory', 'size',
+        'list_price', 'price'
+    )
+
     schema = Schema({
         Optional('_id'): Use(str),
         Optional('id'): str,
@@ -29,3 +72,38 @@ class ResourceModel(BaseModel):
             error='Price should be greater than 0'
         )
     }, ignore_extra_keys=True)
+
+
+class ImportJobModel(BaseModel):
+
+    collection_name = 'import_jobs'
+
+    indexes = (
+        IndexModel(
+            [('job_id', ASCENDING)], name='job_id_unique', unique=True
+        ),
+    )
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+
+    schema = Schema({
+        Optional('_id'): Use(str),
+        'job_id': str,
+        'status': Or(PENDING, RUNNING, FINISHED, FAILED),
+        'bytes_total': int,
+        Optional('bytes_read', default=0): int,
+        Optional('rows_processed', default=0): int,
+        Optional('rows_failed', default=0): int,
+        Optional('created', default=0): int,
+        Optional('updated', default=0): int,
+        Optional('skipped', default=0): int,
+        Optional('resources_failed', default=list): [str],
+        Optional('error', default=None): Or(None, str),
+        Optional('started_at', default=None): Or(None, float),
+        Optional('finished_at', default=None): Or(None, float),
+        # refreshed on every save while the job runs
+        Optional('heartbeat_at', default=None): Or(None, float)
+    }, ignore_extra_keys=True)
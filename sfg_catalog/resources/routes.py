@@ -1,4 +1,7 @@
 from .views import (
+    BatchGetResourcesView,
+    BulkResourcesView,
+    ImportJobView,
     ListResourcesOnScreenView,
     ListResourcesView,
     ResourceView,
@@ -14,4 +17,11 @@ def resources_routes(app):
     app.router.add_route('PUT', '/resources/{id}/', ResourceView)
     app.router.add_route('PATCH', '/resources/{id}/', ResourceView)
     app.router.add_route('DELETE', '/resources/{id}/', ResourceView)
+    app.router.add_route(
+        'POST', '/resources/batch_get/', BatchGetResourcesView
+    )
+    app.router.add_route('POST', '/resources/bulk/', BulkResourcesView)
     app.router.add_route('POST', '/resources/csv_import/', UploadResourcesView)
+    app.router.add_route(
+        'GET', '/resources/imports/{job_id}/', ImportJobView
+    )
@@ -0,0 +1,57 @@
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from sfg_catalog.resources.importer import ResourceImporter
+from sfg_catalog.resources.models import ResourceModel
+
+
+class BytesStream:
+
+    def __init__(self, content):
+        self._content = io.BytesIO(content)
+
+    async def read_chunk(self, size):
+        return self._content.read(size)
+
+
+class TestResourceImporter:
+
+    def _build_csv(self, total):
+        line = '{},dafiti,buscape,Cinto,Nice,acessorios,cinto,P,99.9,20.00\n'
+        return ''.join(line.format(sku) for sku in range(total)).encode()
+
+    async def test_run_imports_every_chunk(self, client):
+        importer = ResourceImporter(chunk_size=7, queue_size=1, writers=3)
+
+        resources_failed = await importer.run(
+            BytesStream(self._build_csv(100))
+        )
+
+        assert resources_failed == []
+        assert await ResourceModel.count() == 100
+
+    async def test_run_collects_failures_from_every_stage(self, client):
+        importer = ResourceImporter(chunk_size=2, queue_size=1, writers=2)
+        content = self._build_csv(3) + b'4,dafiti\n'
+
+        resources_failed = await importer.run(BytesStream(content))
+
+        assert resources_failed == [
+            "Fail to create or update ['4', 'dafiti'], "
+            "reason: Invalid number of columns"
+        ]
+        assert await ResourceModel.count() == 3
+
+    async def test_run_prepares_resources_on_executor(self, client):
+        content = self._build_csv(50) + b'4,dafiti\n'
+
+        with ProcessPoolExecutor(2) as executor:
+            importer = ResourceImporter(chunk_size=10, executor=executor)
+            resources_failed = await importer.run(BytesStream(content))
+
+        assert resources_failed == [
+            "Fail to create or update ['4', 'dafiti'], "
+            "reason: Invalid number of columns"
+        ]
+        assert importer.rows_processed == 51
+        assert await ResourceModel.count() == 50
@@ -0,0 +1,94 @@
+import asyncio
+import io
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from sfg_catalog.main import drain_import_jobs
+from sfg_catalog.resources.jobs import ImportJobManager
+from sfg_catalog.resources.models import ImportJobModel
+
+
+class BytesStream:
+
+    def __init__(self, content):
+        self._content = io.BytesIO(content)
+
+    async def read_chunk(self, size):
+        return self._content.read(size)
+
+
+class TestImportJobManager:
+
+    def _add_task(self, manager, delay):
+        task = asyncio.ensure_future(asyncio.sleep(delay))
+        manager._tasks.add(task)
+        task.add_done_callback(manager._tasks.discard)
+        return task
+
+    async def test_drain_waits_for_running_jobs(self, client):
+        manager = ImportJobManager()
+        task = self._add_task(manager, 0.01)
+
+        assert await manager.drain(timeout=1) == 0
+        assert task.done()
+
+    async def test_drain_gives_up_after_timeout(self, client):
+        manager = ImportJobManager()
+        task = self._add_task(manager, 10)
+
+        assert await manager.drain(timeout=0.01) == 1
+        assert not task.done()
+
+        await manager.close()
+        assert task.cancelled()
+
+    async def test_drain_without_jobs(self, client):
+        assert await ImportJobManager().drain(timeout=1) == 0
+
+    async def test_drain_on_shutdown_runs_in_background(self, client):
+        app = SimpleNamespace(import_jobs=ImportJobManager())
+        task = self._add_task(app.import_jobs, 0.01)
+
+        await drain_import_jobs(app)
+
+        assert not task.done()
+        assert await app.import_jobs_drain == 0
+        assert task.done()
+
+    async def test_start_removes_the_spool_file_when_saving_fails(
+        self,
+        client,
+        tmpdir
+    ):
+        manager = ImportJobManager()
+
+        with mock.patch(
+            'sfg_catalog.resources.jobs.IMPORT_JOB_SPOOL_DIR', str(tmpdir)
+        ), mock.patch.object(
+            ImportJobManager, '_save', side_effect=RuntimeError('down')
+        ):
+            with pytest.raises(RuntimeError):
+                await manager.start(BytesStream(b'1,2\n'))
+
+        assert tmpdir.listdir() == []
+
+    async def test_run_removes_the_spool_file_when_saving_fails(
+        self,
+        client,
+        tmpdir
+    ):
+        manager = ImportJobManager()
+        spool_file = tmpdir.join('csv_import_xpto')
+        spool_file.write(b'1,2\n')
+        job = ImportJobModel(
+            job_id='xpto', status=ImportJobModel.PENDING, bytes_total=4
+        )
+
+        with mock.patch.object(
+            ImportJobManager, '_save', side_effect=RuntimeError('down')
+        ):
+            await manager._run(job, str(spool_file), None)
+
+        assert tmpdir.listdir() == []
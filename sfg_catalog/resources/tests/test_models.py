@@ -0,0 +1,362 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from bson.raw_bson import RawBSONDocument
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from schema import SchemaError
+
+from sfg_catalog.resources.models import ResourceModel, ResourceRecord
+
+
+class TestResourceModel:
+
+    async def test_ensure_indexes(self, client):
+        report = await ResourceModel.index_report()
+
+        assert report['missing'] == []
+        assert report['undeclared'] == []
+
+    async def test_index_report_with_undeclared_index(self, client):
+        await ResourceModel._get_collection().create_index('price')
+
+        report = await ResourceModel.index_report()
+
+        assert report['undeclared'] == ['price_1']
+
+    async def test_id_is_unique(self, client, resource_dict, resource_saved):
+        with pytest.raises(DuplicateKeyError):
+            await ResourceModel(**resource_dict).save()
+
+    async def test_iter_batches(self, client, many_resources_saved):
+        batches = [
+            batch async for batch in ResourceModel.iter_batches(
+                limit=50, batch_size=20
+            )
+        ]
+
+        resources = await ResourceModel.list(limit=50)
+
+        assert [len(batch) for batch in batches] == [20, 20, 10]
+        assert [r['id'] for batch in batches for r in batch] == [
+            r['id'] for r in resources
+        ]
+
+    async def test_list_builds_records_without_validation(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        validator = ResourceModel.validator
+        with mock.patch.object(validator, 'validate') as validate:
+            resources = await ResourceModel.list()
+
+        assert not validate.called
+        assert isinstance(resources[0], ResourceRecord)
+        assert resources[0] == dict(resource_dict, _id=resources[0]['_id'])
+
+    async def test_list_builds_partial_records(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        resources = await ResourceModel.list(
+            projection={'_id': 0, 'sku': 1}
+        )
+
+        assert resources[0].to_dict() == {'sku': resource_dict['sku']}
+        assert resources[0].get('price') is None
+        assert 'price' not in resources[0]
+        with pytest.raises(KeyError):
+            resources[0]['price']
+
+    async def test_get_hydrates_without_storage_fields(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        validator = ResourceModel.validator
+        with mock.patch.object(validator, 'validate') as validate:
+            resource = await ResourceModel.get(id=resource_dict['id'])
+
+        assert not validate.called
+        assert isinstance(resource, ResourceModel)
+        assert 'fingerprint' not in resource
+        assert resource.sku == resource_dict['sku']
+
+    @pytest.mark.parametrize('changes', [
+        {},
+        {'list_price': '99.9', 'price': '10'},
+        {'list_price': '0'},
+        {'price': 'xpto'},
+        {'price': None},
+        {'brand': 1},
+        {'sku': None}
+    ])
+    def test_validator_matches_schema(self, resource_dict, changes):
+        resource_dict.update(changes)
+
+        try:
+            expected = ResourceModel.schema.validate(resource_dict)
+        except SchemaError as error:
+            with pytest.raises(SchemaError) as compiled_error:
+                ResourceModel.validator.validate(resource_dict)
+            assert compiled_error.value.code == error.code
+        else:
+            assert ResourceModel.validator.validate(resource_dict) == expected
+
+    async def test_raw_reads(self, client, resource_dict, resource_saved):
+        resource = await ResourceModel.get(raw=True, id=resource_dict['id'])
+        resources = await ResourceModel.list(raw=True)
+
+        assert isinstance(resource, RawBSONDocument)
+        assert resource['sku'] == resource_dict['sku']
+        assert [r.raw for r in resources] == [resource.raw]
+
+    async def test_get_is_cached(self, client, resource_dict, resource_saved):
+        await ResourceModel.get(id=resource_dict['id'])
+
+        # written behind the model's back, so the cache is not invalidated
+        await ResourceModel._get_collection().update_one(
+            {'id': resource_dict['id']}, {'$set': {'brand': 'xpto'}}
+        )
+        resource = await ResourceModel.get(id=resource_dict['id'])
+        raw_resource = await ResourceModel.get(
+            projection={'_id': 0, 'brand': 1}, raw=True,
+            id=resource_dict['id']
+        )
+
+        assert resource['brand'] == resource_dict['brand']
+        assert dict(raw_resource) == {'brand': resource_dict['brand']}
+        assert ResourceModel.cache_info().hits == 2
+
+    async def test_get_cached_returns_copies(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        resource = await ResourceModel.get(id=resource_dict['id'])
+        resource['brand'] = 'xpto'
+
+        resource = await ResourceModel.get(id=resource_dict['id'])
+
+        assert resource['brand'] == resource_dict['brand']
+
+    async def test_save_and_delete_invalidate_cache(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        resource = await ResourceModel.get(id=resource_dict['id'])
+        resource['brand'] = 'xpto'
+        await resource.save()
+
+        resource = await ResourceModel.get(id=resource_dict['id'])
+        assert resource['brand'] == 'xpto'
+
+        await resource.delete()
+        assert await ResourceModel.get(id=resource_dict['id']) is None
+
+    async def test_bulk_upsert_invalidates_cache(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        await ResourceModel.get(id=resource_dict['id'])
+
+        await ResourceModel._bulk_create_or_update(
+            [dict(resource_dict, brand='xpto')]
+        )
+
+        resource = await ResourceModel.get(id=resource_dict['id'])
+        assert resource['brand'] == 'xpto'
+
+    async def test_find_and_update(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        await ResourceModel.get(id=resource_dict['id'])
+
+        resource = await ResourceModel.find_and_update(
+            {'id': resource_dict['id']}, {'brand': 'xpto'}
+        )
+
+        assert resource['brand'] == 'xpto'
+        assert 'fingerprint' not in resource
+        assert (await ResourceModel.get(id=resource_dict['id']))['brand'] == (
+            'xpto'
+        )
+
+    async def test_find_and_update_fingerprint(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        collection = ResourceModel._get_collection()
+        query = {'id': resource_dict['id']}
+
+        await ResourceModel.find_and_update(query, {'price': 1.0})
+        stored = await collection.find_one(query)
+        assert 'fingerprint' not in stored
+
+        await ResourceModel.find_and_update(query, resource_dict)
+        stored = await collection.find_one(query)
+        assert stored['fingerprint'] == ResourceModel._fingerprint(
+            resource_dict
+        )
+
+    async def test_find_and_update_not_found(self, client, resource_dict):
+        resource = await ResourceModel.find_and_update(
+            {'id': resource_dict['id']}, {'brand': 'xpto'}
+        )
+
+        assert resource is None
+
+    async def test_find_and_delete(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        await ResourceModel.get(id=resource_dict['id'])
+
+        resource = await ResourceModel.find_and_delete(
+            {'id': resource_dict['id']}
+        )
+
+        assert resource['id'] == resource_dict['id']
+        assert await ResourceModel.get(id=resource_dict['id']) is None
+        assert await ResourceModel.find_and_delete(
+            {'id': resource_dict['id']}
+        ) is None
+
+    async def test_get_many(
+        self,
+        client,
+        resource_dict,
+        many_resources_saved
+    ):
+        await ResourceModel.get(id='XPTO1-dafiti-90')
+        hits = ResourceModel.cache_info().hits
+
+        resources = await ResourceModel.get_many(
+            ['XPTO1-dafiti-90', 'XPTO2-kanui-90', 'missing']
+        )
+
+        assert list(resources) == ['XPTO1-dafiti-90', 'XPTO2-kanui-90']
+        assert resources['XPTO2-kanui-90']['seller'] == 'kanui'
+        assert 'fingerprint' not in resources['XPTO2-kanui-90']
+        assert ResourceModel.cache_info().hits == hits + 1
+
+        await ResourceModel.get_many(['XPTO2-kanui-90'])
+        assert ResourceModel.cache_info().hits == hits + 2
+
+    async def test_bulk_write(self, client, resource_dict, resource_saved):
+        await ResourceModel.get(id=resource_dict['id'])
+
+        errors = await ResourceModel.bulk_write([
+            UpdateOne(
+                {'id': resource_dict['id']}, {'$set': {'brand': 'xpto'}}
+            ),
+            InsertOne(dict(resource_dict))
+        ], keys=[resource_dict['id']])
+
+        resource = await ResourceModel.get(id=resource_dict['id'])
+
+        assert list(errors) == [1]
+        assert errors[1]['code'] == 11000
+        assert resource['brand'] == 'xpto'
+        assert await ResourceModel.existing_keys(
+            [resource_dict['id'], 'missing']
+        ) == {resource_dict['id']}
+
+    async def test_writes_drop_list_cache(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        ResourceModel.list_cache.set('listing', '[]')
+
+        await ResourceModel._bulk_create_or_update(
+            [dict(resource_dict, brand='xpto')]
+        )
+
+        assert ResourceModel.list_cache.get('listing') is None
+
+    async def test_writes_bump_revision_and_version(
+        self,
+        client,
+        resource_dict
+    ):
+        collection = ResourceModel._get_collection()
+        query = {'id': resource_dict['id']}
+
+        await ResourceModel(**resource_dict).save()
+        assert (await collection.find_one(query))['revision'] == 1
+        assert await ResourceModel.get_version() == 1
+
+        await ResourceModel.find_and_update(query, {'brand': 'xpto'})
+        await ResourceModel._bulk_create_or_update([dict(resource_dict)])
+
+        assert (await collection.find_one(query))['revision'] == 3
+        assert await ResourceModel.get_version() == 3
+
+    async def test_concurrent_reads_are_coalesced(
+        self,
+        client,
+        resource_dict,
+        many_resources_saved
+    ):
+        collection = ResourceModel._get_read_collection(raw=True)
+
+        with mock.patch.object(
+            type(collection), 'find_one', autospec=True,
+            side_effect=type(collection).find_one
+        ) as find_one_mock:
+            resources = await asyncio.gather(*(
+                ResourceModel.get(id='XPTO1-dafiti-90') for _ in range(5)
+            ))
+
+        assert find_one_mock.call_count == 1
+        assert all(
+            resource['id'] == 'XPTO1-dafiti-90' for resource in resources
+        )
+
+        listings = await asyncio.gather(*(
+            ResourceModel.list({'seller': 'kanui'}, raw=True)
+            for _ in range(3)
+        ))
+
+        assert listings[0] is not listings[1]
+        assert listings[0] == listings[1]
+        assert len(listings[0]) == 20
+
+    async def test_writes_forget_reads_in_flight(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        read = asyncio.ensure_future(
+            ResourceModel.get(id=resource_dict['id'])
+        )
+        await asyncio.sleep(0)
+
+        await ResourceModel.find_and_update(
+            {'id': resource_dict['id']}, {'brand': 'xpto'}
+        )
+        resource = await ResourceModel.get(id=resource_dict['id'])
+        await read
+
+        assert resource['brand'] == 'xpto'
@@ -1,8 +1,15 @@
+import asyncio
+import bz2
+import gzip
 import io
+import json
+import time
+from unittest import mock
 
 import pytest
+from bson import ObjectId
 
-from sfg_catalog.resources.models import ResourceModel
+from sfg_catalog.resources.models import ImportJobModel, ResourceModel
 
 
 class TestListResourcesView:
@@ -100,6 +107,281 @@ class TestListResourcesView:
         assert [p['seller'] for p in payload] == [r.to_dict()['seller'] for r in resources]  # noqa
         assert response.status == 200
 
+    @pytest.mark.parametrize('search,count', [
+        ('seller__exact=kanui', 20),
+        ('seller__exact=kan', 0),
+        ('seller__prefix=kan', 20),
+        ('seller__prefix=anu', 0),
+        ('seller__prefix=KAN', 0),
+        ('seller__iprefix=KAN', 20),
+        ('seller__contains=anu', 20),
+        ('sku__prefix=XPTO1', 33)
+    ])
+    async def test_get_resources_filtering_by_match_mode(
+        self,
+        client,
+        search,
+        count,
+        many_resources_saved
+    ):
+        response = await client.get(
+            '/resources/?limit=100&{}'.format(search)
+        )
+
+        payload = await response.json()
+
+        assert len(payload) == count
+        assert response.status == 200
+
+    async def test_get_resources_filtering_escapes_search_terms(
+        self,
+        client,
+        many_resources_saved
+    ):
+        response = await client.get('/resources/?seller=.*')
+
+        payload = await response.json()
+
+        assert payload == []
+        assert response.status == 200
+
+    async def test_get_resources_filtering_by_invalid_match_mode(
+        self,
+        client
+    ):
+        expected_response = {
+            'error_message': 'Invalid match mode xpto',
+            'error_reason': 'Bad Request'
+        }
+
+        response = await client.get('/resources/?seller__xpto=kanui')
+
+        payload = await response.json()
+
+        assert payload == expected_response
+        assert response.status == 400
+
+    async def test_get_resources_by_text_search(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        resource_dict.update(
+            id='XPTO-mega_boots-90',
+            sku='XPTO',
+            product_name='Tenis Casual',
+            brand='Olympikus'
+        )
+        await ResourceModel(**resource_dict).save()
+
+        response = await client.get('/resources/?q=boots')
+
+        payload = await response.json()
+
+        assert [p['id'] for p in payload] == [resource_saved['id']]
+        assert response.status == 200
+
+    async def test_get_resources_streaming_json(
+        self,
+        client,
+        many_resources_saved
+    ):
+        response = await client.get('/resources/?stream=true&limit=0')
+
+        payload = await response.json()
+        resources = await ResourceModel.list()
+
+        assert [p['id'] for p in payload] == [r['id'] for r in resources]
+        assert '_id' not in payload[0]
+        assert response.headers['Transfer-Encoding'] == 'chunked'
+        assert response.status == 200
+
+    async def test_get_resources_streaming_ndjson(
+        self,
+        client,
+        many_resources_saved
+    ):
+        response = await client.get(
+            '/resources/?limit=8&page=2&seller=kanui',
+            headers={'Accept': 'application/x-ndjson'}
+        )
+
+        lines = (await response.text()).splitlines()
+        payload = [json.loads(line) for line in lines]
+        resources = await ResourceModel.list(
+            {'seller': 'kanui'}, limit=8, skip=8
+        )
+
+        assert response.content_type == 'application/x-ndjson'
+        assert [p['id'] for p in payload] == [r['id'] for r in resources]
+        assert response.status == 200
+
+    async def test_get_resources_streaming_is_empty(self, client):
+        response = await client.get('/resources/?stream=true')
+
+        payload = await response.json()
+
+        assert payload == []
+        assert response.status == 200
+
+    async def test_get_resources_with_fields(
+        self,
+        client,
+        many_resources_saved
+    ):
+        response = await client.get('/resources/?fields=id,price')
+
+        payload = await response.json()
+        resources = await ResourceModel.list(limit=20)
+
+        assert payload == [
+            {'id': r['id'], 'price': r['price']} for r in resources
+        ]
+        assert response.status == 200
+
+    async def test_get_resources_by_cursor_with_fields(
+        self,
+        client,
+        many_resources_saved
+    ):
+        response = await client.get('/resources/?fields=sku&cursor=')
+
+        payload = await response.json()
+
+        assert payload[0] == {'sku': 'XPTO0'}
+        assert 'X-Next-Cursor' in response.headers
+        assert response.status == 200
+
+    async def test_get_resources_with_invalid_fields(self, client):
+        expected_response = {
+            'error_message': 'Invalid fields _id, fingerprint',
+            'error_reason': 'Bad Request'
+        }
+
+        response = await client.get(
+            '/resources/?fields=id,_id,fingerprint'
+        )
+
+        payload = await response.json()
+
+        assert payload == expected_response
+        assert response.status == 400
+
+    async def test_get_resources_by_cursor(
+        self,
+        client,
+        many_resources_saved
+    ):
+        resources = await ResourceModel.list()
+        ids = []
+        cursor = ''
+
+        for _ in range(3):
+            response = await client.get(
+                '/resources/?limit=25&cursor={}'.format(cursor)
+            )
+            payload = await response.json()
+            ids.extend(p['id'] for p in payload)
+            cursor = response.headers.get('X-Next-Cursor')
+
+            assert response.status == 200
+
+        assert cursor is None
+        assert len(payload) == 10
+        assert ids == [r['id'] for r in resources]
+
+    async def test_get_resources_by_cursor_with_filter(
+        self,
+        client,
+        many_resources_saved
+    ):
+        response = await client.get('/resources/?seller=kanui&cursor=')
+        cursor = response.headers['X-Next-Cursor']
+
+        response = await client.get(
+            '/resources/?seller=kanui&cursor={}'.format(cursor)
+        )
+
+        payload = await response.json()
+
+        assert payload == []
+        assert 'X-Next-Cursor' not in response.headers
+        assert response.status == 200
+
+    async def test_get_resources_by_cursor_bad_request(self, client):
+        expected_response = {
+            'error_message': 'Invalid cursor',
+            'error_reason': 'Bad Request'
+        }
+
+        response = await client.get('/resources/?cursor=xpto')
+
+        payload = await response.json()
+
+        assert payload == expected_response
+        assert response.status == 400
+
+    async def test_list_resources_is_cached(
+        self,
+        client,
+        many_resources_saved
+    ):
+        with mock.patch.object(
+            ResourceModel, 'list', wraps=ResourceModel.list
+        ) as list_mock:
+            first = await client.get('/resources/?seller=kanui&limit=5')
+            second = await client.get('/resources/?limit=5&seller=kanui')
+
+            assert await first.json() == await second.json()
+            assert list_mock.call_count == 1
+
+            await client.get('/resources/?seller=kanui&limit=5&page=2')
+            assert list_mock.call_count == 2
+
+    async def test_list_resources_cache_is_dropped_on_writes(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        response = await client.get('/resources/')
+        assert (await response.json())[0]['brand'] == resource_dict['brand']
+
+        await client.patch(
+            '/resources/{id}/'.format(id=resource_dict['id']),
+            json={'brand': 'xpto'}
+        )
+
+        response = await client.get('/resources/')
+        assert (await response.json())[0]['brand'] == 'xpto'
+
+    async def test_list_resources_not_modified(
+        self,
+        client,
+        resource_dict,
+        many_resources_saved
+    ):
+        url = '/resources/?seller=kanui'
+        response = await client.get(url)
+        etag = response.headers['ETag']
+
+        with mock.patch.object(
+            ResourceModel, 'list', wraps=ResourceModel.list
+        ) as list_mock:
+            response = await client.get(
+                url, headers={'If-None-Match': etag}
+            )
+
+            assert response.status == 304
+            assert list_mock.call_count == 0
+
+        await client.delete('/resources/XPTO1-kanui-90/')
+        response = await client.get(url, headers={'If-None-Match': etag})
+
+        assert response.headers['ETag'] != etag
+        assert response.status == 200
+
 
 class TestListResourcesOnScreenView:
 
@@ -147,6 +429,101 @@ class TestResourceView:
         assert payload == resource_dict
         assert response.status == 200
 
+    async def test_get_a_cached_resource_is_decoded_once(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        url = '/resources/{id}/'.format(id=resource_dict['id'])
+        await client.get(url)
+
+        with mock.patch(
+            'sfg_catalog.common.models.decode_raw_document'
+        ) as decode_mock:
+            response = await client.get(url)
+
+        payload = await response.json()
+
+        assert payload == resource_dict
+        assert decode_mock.call_count == 0
+
+    async def test_get_a_resource_not_modified(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        url = '/resources/{id}/'.format(id=resource_dict['id'])
+        response = await client.get(url)
+        etag = response.headers['ETag']
+
+        response = await client.get(url, headers={'If-None-Match': etag})
+
+        assert await response.read() == b''
+        assert response.headers['ETag'] == etag
+        assert response.status == 304
+
+        response = await client.get(
+            url, headers={'If-None-Match': '"xpto", W/{}'.format(etag)}
+        )
+        assert response.status == 304
+
+        response = await client.get(
+            url + '?fields=price', headers={'If-None-Match': etag}
+        )
+        assert response.status == 200
+
+        await client.patch(url, json={'brand': 'xpto'})
+        response = await client.get(url, headers={'If-None-Match': etag})
+
+        payload = await response.json()
+
+        assert payload['brand'] == 'xpto'
+        assert 'revision' not in payload
+        assert response.headers['ETag'] != etag
+        assert response.status == 200
+
+    async def test_get_a_recreated_resource_is_modified(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        url = '/resources/{id}/'.format(id=resource_dict['id'])
+        response = await client.get(url)
+        etag = response.headers['ETag']
+
+        await client.delete(url)
+        await client.post('/resources/', json=dict(resource_dict, price=10))
+        response = await client.get(url, headers={'If-None-Match': etag})
+
+        payload = await response.json()
+
+        assert payload['price'] == 10
+        assert response.headers['ETag'] != etag
+        assert response.status == 200
+
+    async def test_get_a_resource_with_fields(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        response = await client.get(
+            '/resources/{id}/?fields=id, list_price'.format(
+                id=resource_dict['id']
+            )
+        )
+
+        payload = await response.json()
+
+        assert payload == {
+            'id': resource_dict['id'],
+            'list_price': resource_dict['list_price']
+        }
+        assert response.status == 200
+
     async def test_get_a_resource_not_found(
         self,
         client,
@@ -172,6 +549,22 @@ class TestResourceView:
         assert resource_dict == resource
         assert response.status == 201
 
+    async def test_create_a_resource_ignores_its_id(
+        self,
+        client,
+        resource_dict
+    ):
+        response = await client.post(
+            '/resources/', json=dict(resource_dict, _id='abc')
+        )
+
+        document = await ResourceModel._get_collection().find_one(
+            {'id': resource_dict['id']}
+        )
+
+        assert isinstance(document['_id'], ObjectId)
+        assert response.status == 201
+
     @pytest.mark.parametrize(
         'field,value',
         [
@@ -408,6 +801,41 @@ class TestResourceView:
         assert request_payload[field] == resource_on_db[field]
         assert response.status == 200
 
+    async def test_partially_update_a_resource_converts_values(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        response = await client.patch(
+            '/resources/{id}/'.format(id=resource_dict['id']),
+            json={'price': '12', 'sku': 'xpto'}
+        )
+
+        payload = await response.json()
+        resource_on_db = await ResourceModel.get(id=resource_dict['id'])
+
+        assert payload['price'] == 12.0
+        assert resource_on_db['price'] == 12.0
+        assert resource_on_db['sku'] == resource_dict['sku']
+        assert response.status == 200
+
+    async def test_partially_update_a_resource_not_found(
+        self,
+        client,
+        resource_dict,
+        expected_response_not_found
+    ):
+        response = await client.patch(
+            '/resources/{id}/'.format(id=resource_dict['id']),
+            json={'price': 12.0}
+        )
+
+        payload = await response.json()
+
+        assert payload == expected_response_not_found
+        assert response.status == 404
+
     @pytest.mark.parametrize(
         'field,value',
         [
@@ -482,6 +910,277 @@ class TestResourceView:
         assert response.status == 404
 
 
+class TestBatchGetResourcesView:
+
+    async def test_batch_get_resources_in_request_order(
+        self,
+        client,
+        resource_dict,
+        many_resources_saved
+    ):
+        ids = [
+            'XPTO3-kanui-90', 'missing', 'XPTO1-dafiti-90', 'XPTO3-kanui-90'
+        ]
+
+        response = await client.post('/resources/batch_get/', json={
+            'ids': ids
+        })
+
+        payload = await response.json()
+
+        assert [
+            resource and resource['id'] for resource in payload['resources']
+        ] == ['XPTO3-kanui-90', None, 'XPTO1-dafiti-90', 'XPTO3-kanui-90']
+        assert payload['not_found'] == ['missing']
+        assert '_id' not in payload['resources'][0]
+        assert 'fingerprint' not in payload['resources'][0]
+        assert response.status == 200
+
+    async def test_batch_get_resources_with_fields(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        response = await client.post(
+            '/resources/batch_get/?fields=price',
+            json={'ids': [resource_dict['id']]}
+        )
+
+        payload = await response.json()
+
+        assert payload == {
+            'resources': [{'price': resource_dict['price']}],
+            'not_found': []
+        }
+        assert response.status == 200
+
+    @pytest.mark.parametrize('request_payload', [
+        [], {}, {'ids': 'xpto'}, {'ids': [1]}
+    ])
+    async def test_batch_get_resources_bad_request_with_invalid_ids(
+        self,
+        request_payload,
+        client
+    ):
+        response = await client.post(
+            '/resources/batch_get/', json=request_payload
+        )
+
+        payload = await response.json()
+
+        assert payload['error_message'] == 'ids should be a list of strings'
+        assert response.status == 400
+
+    async def test_batch_get_resources_bad_request_with_too_many_ids(
+        self,
+        client
+    ):
+        response = await client.post('/resources/batch_get/', json={
+            'ids': [str(i) for i in range(101)]
+        })
+
+        payload = await response.json()
+
+        assert payload['error_message'] == (
+            'Too many ids, at most 100 are allowed'
+        )
+        assert response.status == 400
+
+    async def test_batch_get_resources_bad_request_without_request_body(
+        self,
+        client
+    ):
+        response = await client.post('/resources/batch_get/')
+
+        payload = await response.json()
+
+        assert payload['error_message'] == 'Invalid payload'
+        assert response.status == 400
+
+
+class TestBulkResourcesView:
+
+    async def test_bulk_operations(
+        self,
+        client,
+        resource_dict,
+        many_resources_saved
+    ):
+        new_resource = dict(resource_dict, sku='NEW1')
+        del new_resource['id']
+
+        response = await client.post('/resources/bulk/', json=[
+            {'op': 'create', 'resource': new_resource},
+            {
+                'op': 'update',
+                'id': 'XPTO1-dafiti-90',
+                'resource': dict(resource_dict, brand='xpto')
+            },
+            {'op': 'patch', 'id': 'XPTO2-dafiti-90',
+             'resource': {'price': '12'}},
+            {'op': 'delete', 'id': 'XPTO3-dafiti-90'}
+        ])
+
+        payload = await response.json()
+
+        assert payload == {'results': [
+            {'op': 'create', 'id': 'NEW1-tricae-90', 'status': 201},
+            {'op': 'update', 'id': 'XPTO1-dafiti-90', 'status': 200},
+            {'op': 'patch', 'id': 'XPTO2-dafiti-90', 'status': 200},
+            {'op': 'delete', 'id': 'XPTO3-dafiti-90', 'status': 204}
+        ]}
+        assert response.status == 200
+
+        updated = await ResourceModel.get(id='XPTO1-dafiti-90')
+        patched = await ResourceModel.get(id='XPTO2-dafiti-90')
+
+        assert await ResourceModel.get(id='NEW1-tricae-90')
+        assert updated['brand'] == 'xpto'
+        assert updated['sku'] == 'XPTO1'
+        assert patched['price'] == 12.0
+        assert await ResourceModel.get(id='XPTO3-dafiti-90') is None
+        assert await ResourceModel.count() == 60
+
+    async def test_bulk_operations_with_failures(
+        self,
+        client,
+        resource_dict,
+        resource_saved
+    ):
+        response = await client.post('/resources/bulk/', json=[
+            {'op': 'create', 'resource': resource_dict},
+            {'op': 'patch', 'id': 'missing', 'resource': {'price': 1}},
+            {'op': 'patch', 'id': resource_dict['id'],
+             'resource': {'price': 0}},
+            {'op': 'delete'},
+            {'op': 'xpto'},
+            'xpto',
+            {'op': 'delete', 'id': 'other'}
+        ])
+
+        payload = await response.json()
+
+        assert payload == {'results': [
+            {
+                'op': 'create',
+                'id': resource_dict['id'],
+                'status': 409,
+                'error_message': (
+                    'It was not possible to create a resource {}'
+                    ' that already exists'.format(resource_dict['id'])
+                )
+            },
+            {
+                'op': 'patch',
+                'id': 'missing',
+                'status': 404,
+                'error_message': 'Resource missing not found'
+            },
+            {
+                'op': 'patch',
+                'id': resource_dict['id'],
+                'status': 400,
+                'error_message': 'Price should be greater than 0'
+            },
+            {
+                'op': 'delete',
+                'id': None,
+                'status': 400,
+                'error_message': 'Missing id'
+            },
+            {
+                'op': 'xpto',
+                'id': None,
+                'status': 400,
+                'error_message': 'Invalid operation'
+            },
+            {
+                'op': None,
+                'id': None,
+                'status': 400,
+                'error_message': 'Invalid operation'
+            },
+            {
+                'op': 'delete',
+                'id': 'other',
+                'status': 404,
+                'error_message': 'Resource other not found'
+            }
+        ]}
+        assert await ResourceModel.count() == 1
+        assert response.status == 207
+
+    async def test_bulk_operations_on_the_same_resource(
+        self,
+        client,
+        resource_dict,
+        many_resources_saved
+    ):
+        response = await client.post('/resources/bulk/', json=[
+            {'op': 'delete', 'id': 'XPTO1-dafiti-90'},
+            {'op': 'patch', 'id': 'XPTO1-dafiti-90',
+             'resource': {'price': '12'}},
+            {'op': 'delete', 'id': 'XPTO2-dafiti-90'}
+        ])
+
+        payload = await response.json()
+
+        error_message = (
+            'Resource XPTO1-dafiti-90 is the target of more than one'
+            ' operation'
+        )
+        assert payload == {'results': [
+            {
+                'op': 'delete',
+                'id': 'XPTO1-dafiti-90',
+                'status': 400,
+                'error_message': error_message
+            },
+            {
+                'op': 'patch',
+                'id': 'XPTO1-dafiti-90',
+                'status': 400,
+                'error_message': error_message
+            },
+            {'op': 'delete', 'id': 'XPTO2-dafiti-90', 'status': 204}
+        ]}
+        assert await ResourceModel.get(id='XPTO1-dafiti-90')
+        assert response.status == 207
+
+    async def test_bulk_create_ignores_the_id(self, client, resource_dict):
+        response = await client.post('/resources/bulk/', json=[
+            {'op': 'create', 'resource': dict(resource_dict, _id='abc')}
+        ])
+
+        document = await ResourceModel._get_collection().find_one(
+            {'id': resource_dict['id']}
+        )
+
+        assert isinstance(document['_id'], ObjectId)
+        assert response.status == 200
+
+    @pytest.mark.parametrize('request_payload,error_message', [
+        ({'op': 'delete'}, 'Payload should be a list'),
+        ([{'op': 'delete', 'id': 'xpto'}] * 1001,
+         'Too many operations, at most 1000 are allowed')
+    ])
+    async def test_bulk_operations_bad_request(
+        self,
+        request_payload,
+        error_message,
+        client
+    ):
+        response = await client.post(
+            '/resources/bulk/', json=request_payload
+        )
+
+        payload = await response.json()
+
+        assert payload['error_message'] == error_message
+        assert response.status == 400
+
+
 class TestUploadResourcesView:
 
     @pytest.fixture
@@ -505,20 +1204,29 @@ class TestUploadResourcesView:
 
         response = await client.post('/resources/csv_import/', data=data)
 
-        assert response.status == 204
+        payload = await response.json()
+
+        assert payload == {'created': 24, 'updated': 0, 'skipped': 0}
+        assert response.status == 200
 
     async def test_upload_file_with_some_resource_failed(
         self,
         client,
         csv_file_with_invalid_data
     ):
-        expected_response = {'resources_failed': [
-            "Fail to create or update Resource(sku='sku', seller='seller', "
-            "campaign_code='campaign_code', product_name='product_name', "
-            "brand='brand', category='category', subcategory='subcategory', "
-            "size='size', list_price='list_price', price='price'), "
-            "reason: List price should be greater than 0"
-        ]}
+        expected_response = {
+            'created': 24,
+            'updated': 0,
+            'skipped': 0,
+            'resources_failed': [
+                "Fail to create or update Resource(sku='sku', "
+                "seller='seller', campaign_code='campaign_code', "
+                "product_name='product_name', brand='brand', "
+                "category='category', subcategory='subcategory', "
+                "size='size', list_price='list_price', price='price'), "
+                "reason: List price should be greater than 0"
+            ]
+        }
         data = {'csv_file': csv_file_with_invalid_data}
 
         response = await client.post('/resources/csv_import/', data=data)
@@ -547,3 +1255,273 @@ class TestUploadResourcesView:
         response = await client.post('/resources/csv_import/', data={})
 
         assert response.status == 400
+
+    async def test_upload_file_with_quoted_fields_and_crlf(
+        self,
+        client
+    ):
+        csv_file = io.BytesIO(
+            b'1111,dafiti,buscape,"Cinto couro, com fivela",Nice,acessorios,cinto,P,99.9,20.00\r\n'  # noqa
+            b'2222,dafiti,buscape,"Cueca ""de"" bolinhas",Nice,roupas,cueca,P,65.50,15.50\r\n'  # noqa
+        )
+        data = {'csv_file': csv_file}
+
+        response = await client.post('/resources/csv_import/', data=data)
+
+        first = await ResourceModel.get(id='1111-dafiti-buscape')
+        second = await ResourceModel.get(id='2222-dafiti-buscape')
+
+        assert first['product_name'] == 'Cinto couro, com fivela'
+        assert second['product_name'] == 'Cueca "de" bolinhas'
+        assert second['size'] == 'P'
+        assert response.status == 200
+
+    async def test_upload_file_with_quote_in_unquoted_field(
+        self,
+        client
+    ):
+        csv_file = io.BytesIO(
+            b'1111,dafiti,buscape,Monitor 27" LG,LG,informatica,monitor,U,999.9,100.00\n'  # noqa
+            b'2222,dafiti,buscape,Cinto,Nice,acessorios,cinto,P,99.9,20.00\n'
+            b'3333,dafiti,buscape,Cueca,Nice,roupas,cueca,P,65.50,15.50\n'
+        )
+        data = {'csv_file': csv_file}
+
+        response = await client.post('/resources/csv_import/', data=data)
+
+        payload = await response.json()
+        first = await ResourceModel.get(id='1111-dafiti-buscape')
+
+        assert payload == {'created': 3, 'updated': 0, 'skipped': 0}
+        assert first['product_name'] == 'Monitor 27" LG'
+        assert response.status == 200
+
+    async def test_upload_file_bad_request_when_not_utf8(self, client):
+        csv_file = io.BytesIO(
+            'Meião,dafiti,buscape,Meia,Nice,roupas,meia,P,9.9,1.00\n'.encode(
+                'latin-1'
+            )
+        )
+        data = {'csv_file': csv_file}
+
+        response = await client.post('/resources/csv_import/', data=data)
+
+        assert response.status == 400
+
+    async def test_upload_file_with_invalid_number_of_columns(
+        self,
+        client
+    ):
+        expected_response = {
+            'created': 0,
+            'updated': 0,
+            'skipped': 0,
+            'resources_failed': [
+                "Fail to create or update ['1111', 'dafiti', 'buscape'], "
+                "reason: Invalid number of columns"
+            ]
+        }
+        csv_file = io.BytesIO(b'1111,dafiti,buscape\n')
+        data = {'csv_file': csv_file}
+
+        response = await client.post('/resources/csv_import/', data=data)
+
+        payload = await response.json()
+
+        assert payload == expected_response
+        assert response.status == 207
+
+    async def test_upload_file_twice_updates_resources(
+        self,
+        client,
+        csv_file
+    ):
+        await client.post(
+            '/resources/csv_import/', data={'csv_file': csv_file}
+        )
+        csv_file = io.BytesIO(
+            b'1111,dafiti,buscape,Cinto couro com fivela de metal,bananas de pijama,acessorios,cinto,\xc3\xbanico,99.9,29.90\n'  # noqa
+        )
+
+        response = await client.post(
+            '/resources/csv_import/', data={'csv_file': csv_file}
+        )
+
+        payload = await response.json()
+        resource = await ResourceModel.get(id='1111-dafiti-buscape')
+
+        assert payload == {'created': 0, 'updated': 1, 'skipped': 0}
+        assert resource['price'] == 77.0
+        assert await ResourceModel.count() == 24
+        assert response.status == 200
+
+    async def test_upload_same_file_twice_skips_unchanged_resources(
+        self,
+        client,
+        csv_file
+    ):
+        content = csv_file.read()
+        await client.post(
+            '/resources/csv_import/',
+            data={'csv_file': io.BytesIO(content)}
+        )
+
+        response = await client.post(
+            '/resources/csv_import/',
+            data={'csv_file': io.BytesIO(content)}
+        )
+
+        payload = await response.json()
+
+        assert payload == {'created': 0, 'updated': 0, 'skipped': 24}
+        assert response.status == 200
+
+    async def test_upload_file_updates_resource_edited_through_api(
+        self,
+        client,
+        csv_file
+    ):
+        content = csv_file.read()
+        await client.post(
+            '/resources/csv_import/',
+            data={'csv_file': io.BytesIO(content)}
+        )
+        await client.patch(
+            '/resources/1111-dafiti-buscape/', json={'brand': 'Fulano'}
+        )
+
+        response = await client.post(
+            '/resources/csv_import/',
+            data={'csv_file': io.BytesIO(content)}
+        )
+
+        payload = await response.json()
+        resource = await ResourceModel.get(id='1111-dafiti-buscape')
+
+        assert payload == {'created': 0, 'updated': 1, 'skipped': 23}
+        assert resource['brand'] == 'bananas de pijama'
+        assert response.status == 200
+
+    async def test_upload_file_in_background(
+        self,
+        client,
+        csv_file
+    ):
+        data = {'csv_file': csv_file}
+
+        response = await client.post(
+            '/resources/csv_import/?async=true', data=data
+        )
+
+        payload = await response.json()
+
+        assert payload['status'] == 'pending'
+        assert response.status == 202
+
+    @pytest.mark.parametrize('compress', [gzip.compress, bz2.compress])
+    async def test_upload_compressed_file(
+        self,
+        client,
+        csv_file,
+        compress
+    ):
+        data = {'csv_file': io.BytesIO(compress(csv_file.read()))}
+
+        response = await client.post('/resources/csv_import/', data=data)
+
+        payload = await response.json()
+
+        assert payload == {'created': 24, 'updated': 0, 'skipped': 0}
+        assert response.status == 200
+
+    async def test_upload_compressed_file_bad_request_when_corrupted(
+        self,
+        client,
+        csv_file
+    ):
+        expected_response = {
+            'error_message': 'Invalid gzip content: truncated file',
+            'error_reason': 'Bad Request'
+        }
+        data = {'csv_file': io.BytesIO(gzip.compress(csv_file.read())[:-8])}
+
+        response = await client.post('/resources/csv_import/', data=data)
+
+        payload = await response.json()
+
+        assert payload == expected_response
+        assert response.status == 400
+
+
+class TestImportJobView:
+
+    async def _wait_job(self, client, job_id):
+        for _ in range(50):
+            response = await client.get(
+                '/resources/imports/{}/'.format(job_id)
+            )
+            payload = await response.json()
+            if payload['status'] in ('finished', 'failed'):
+                return response, payload
+            await asyncio.sleep(0.1)
+
+    async def test_get_import_job_progress(self, client):
+        csv_file = io.BytesIO(
+            b'1111,dafiti,buscape,Cinto,Nice,acessorios,cinto,P,99.9,20.00\n'
+            b'2222,dafiti,buscape,Cinto,Nice,acessorios,cinto,P,0,20.00\n'
+        )
+        response = await client.post(
+            '/resources/csv_import/?async=true', data={'csv_file': csv_file}
+        )
+        job = await response.json()
+
+        response, payload = await self._wait_job(client, job['job_id'])
+
+        assert payload['job_id'] == job['job_id']
+        assert payload['status'] == 'finished'
+        assert payload['rows_processed'] == 2
+        assert payload['rows_failed'] == 1
+        assert payload['bytes_read'] == payload['bytes_total']
+        assert payload['eta'] == 0
+        assert await ResourceModel.count() == 1
+        assert response.status == 200
+
+    @pytest.mark.parametrize('heartbeat_age,status', [
+        (1, 'running'),
+        (3600, 'failed')
+    ])
+    async def test_get_import_job_whose_worker_stopped(
+        self,
+        client,
+        heartbeat_age,
+        status
+    ):
+        await ImportJobModel(
+            job_id='xpto',
+            status=ImportJobModel.RUNNING,
+            bytes_total=100,
+            bytes_read=10,
+            started_at=time.time() - 3600,
+            heartbeat_at=time.time() - heartbeat_age
+        ).save()
+
+        response = await client.get('/resources/imports/xpto/')
+
+        payload = await response.json()
+
+        assert payload['status'] == status
+        assert (payload['eta'] is None) == (status == 'failed')
+        assert response.status == 200
+
+    async def test_get_import_job_not_found(self, client):
+        expected_response = {
+            'error_message': 'Import job xpto not found',
+            'error_reason': 'Not Found'
+        }
+
+        response = await client.get('/resources/imports/xpto/')
+
+        payload = await response.json()
+
+        assert payload == expected_response
+        assert response.status == 404
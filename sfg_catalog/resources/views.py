@@ -1,36 +1,154 @@
-import asyncio
-from collections import namedtuple
+import csv
+import json
+import re
+import time
+from collections import Counter
 from json import JSONDecodeError
 
 import aiohttp_jinja2
+from aiohttp import BodyPartReader
+from aiohttp.hdrs import ACCEPT, CONTENT_ENCODING, ETAG
 from aiohttp.web import View
 from aiohttp.web_exceptions import HTTPBadRequest, HTTPConflict, HTTPNotFound
-from aiohttp.web_request import FileField
+from pymongo import ASCENDING, DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from schema import SchemaError
 
-from sfg_catalog.common.base import BaseView
+from sfg_catalog.common.base import JSON, NDJSON, BaseView
+from sfg_catalog.common.encoders import decode_raw_documents
+from sfg_catalog.common.streams import DecompressingStream, StreamError
+from sfg_catalog.settings import (
+    IMPORT_JOB_HEARTBEAT_TIMEOUT,
+    RESOURCE_BATCH_GET_MAX_IDS,
+    RESOURCE_BULK_MAX_OPERATIONS
+)
 
-from .helpers import generate_resource_id
-from .models import ResourceModel
+from .helpers import clean_not_editable_fields, generate_resource_id
+from .importer import ResourceImporter
+from .models import ImportJobModel, ResourceModel
 
+# status of each operation of `BulkResourcesView` that succeeds
+BULK_OPERATIONS = {
+    'create': 201,
+    'update': 200,
+    'patch': 200,
+    'delete': 204
+}
 
-class ListResourcesView(BaseView):
 
-    fields_available_for_search = (
-        'sku', 'seller', 'campagin_code', 'product_name', 'brand', 'size',
-        'category', 'subcategory'
+def not_found(resource_id):
+    return 'Resource {} not found'.format(resource_id)
+
+
+def repeated_target(resource_id):
+    return 'Resource {} is the target of more than one operation'.format(
+        resource_id
     )
 
+
+def already_exists(resource_id):
+    return (
+        'It was not possible to create a resource {}'
+        ' that already exists'.format(resource_id)
+    )
+
+
+class ListResourcesView(BaseView):
+
+    fields_available_for_search = ResourceModel.searchable_fields
+
+    # `field=term` keeps the "contains" search, `field__<mode>=term`
+    # selects another one. Only exact and prefix matches can use the
+    # field index bounds.
+    match_modes = {
+        '': lambda term: {'$regex': re.escape(term)},
+        'contains': lambda term: {'$regex': re.escape(term)},
+        'exact': lambda term: term,
+        'prefix': lambda term: {'$regex': '^' + re.escape(term)},
+        'iprefix': lambda term: {
+            '$regex': '^' + re.escape(term), '$options': 'i'
+        }
+    }
+
     async def get(self):
         page, limit = self._prepare_pagination()
         query = self._prepare_query()
 
+        if 'cursor' in self.request.query:
+            return await self._get_page_after_cursor(query, limit)
+
+        projection = self._prepare_projection(
+            ResourceModel.projection_fields
+        )
+
+        content_type = self._streaming_content_type()
+        if content_type:
+            batches = ResourceModel.iter_batches(
+                query,
+                limit=limit,
+                skip=limit * (page - 1),
+                projection=projection,
+                raw=True
+            )
+            return await self.stream_response(200, batches, content_type)
+
+        def load():
+            return ResourceModel.list(
+                query,
+                limit=limit,
+                skip=limit * (page - 1),
+                projection=projection,
+                raw=True
+            )
+
+        key = json.dumps([query, page, limit, projection], sort_keys=True)
+        version = await ResourceModel.get_version()
+        etag = self.etag(version, key)
+        if self.not_modified(etag):
+            return self.response(304, headers={ETAG: etag})
+
+        # unbounded listings would take too much of the cache
+        if ResourceModel.list_cache is None or not limit:
+            content = await load()
+        else:
+            content = await self.cached_content(
+                ResourceModel.list_cache, (key, version), load
+            )
+        return self.response(200, content, headers={ETAG: etag})
+
+    async def _get_page_after_cursor(self, query, limit):
+        cursor = self.request.query['cursor']
+        if cursor:
+            query['_id'] = {'$gt': self._decode_cursor(cursor)}
+
+        # the next cursor is built from the last `_id`
+        projection = self._prepare_projection(
+            ResourceModel.projection_fields, keep_id=True
+        )
+
         resources = await ResourceModel.list(
             query,
             limit=limit,
-            skip=limit * (page - 1)
+            sort=[('_id', ASCENDING)],
+            projection=projection,
+            raw=True
         )
-        return self.response(200, resources)
+
+        headers = {}
+        if limit and len(resources) == limit:
+            next_cursor = self._encode_cursor(resources[-1]['_id'])
+            headers['X-Next-Cursor'] = next_cursor
+            headers['Link'] = '<{}>; rel="next"'.format(
+                self.request.rel_url.update_query(cursor=next_cursor)
+            )
+
+        return self.response(200, resources, headers=headers)
+
+    def _streaming_content_type(self):
+        if NDJSON in self.request.headers.get(ACCEPT, ''):
+            return NDJSON
+        if self.request.query.get('stream') == 'true':
+            return JSON
 
     def _prepare_pagination(self):
         page = self.request.query.get('page', '1')
@@ -42,10 +160,20 @@ class ListResourcesView(BaseView):
 
     def _prepare_query(self):
         query = {}
-        for field in self.fields_available_for_search:
-            search_term = self.request.query.get(field)
+        for key, search_term in self.request.query.items():
+            field, _, match_mode = key.partition('__')
+            if field not in self.fields_available_for_search:
+                continue
+            if match_mode not in self.match_modes:
+                raise HTTPBadRequest(
+                    reason='Invalid match mode {}'.format(match_mode)
+                )
             if search_term:
-                query[field] = {'$regex': '{}'.format(search_term)}
+                query[field] = self.match_modes[match_mode](search_term)
+
+        text_search = self.request.query.get('q')
+        if text_search:
+            query['$text'] = {'$search': text_search}
 
         return query
 
@@ -61,11 +189,30 @@ class ListResourcesOnScreenView(View):
 class ResourceView(BaseView):
 
     async def get(self):
-        resource = await self._retrieve_resource()
-        return self.response(200, resource)
+        projection = self._prepare_projection(
+            ResourceModel.projection_fields
+        )
+        # the `_id` and the revision give the ETag, the `_id` tells apart
+        # a document deleted and created again, both are left out of the
+        # content later
+        resource = await self._retrieve_resource(
+            self._raw_projection(self._with_field(
+                self._with_field(projection, 'revision'), '_id'
+            )),
+            raw=True
+        )
+
+        etag = self.etag(
+            resource.get('_id'), resource.get('revision', 0), projection
+        )
+        if self.not_modified(etag):
+            return self.response(304, headers={ETAG: etag})
+        return self.response(200, resource, headers={ETAG: etag})
 
     async def post(self):
         payload = await self._validate_payload()
+        # mongo generates the `_id`, the cursors rely on it
+        payload.pop('_id', None)
 
         payload['id'] = generate_resource_id(
             payload['sku'],
@@ -73,141 +220,350 @@ class ResourceView(BaseView):
             payload['campaign_code']
         )
 
-        result = await ResourceModel.get(id=payload['id'])
-        if result:
-            raise HTTPConflict(
-                reason='It was not possible to create a resource {}'
-                       ' that already exists'.format(payload['id'])
-            )
-
         resource = ResourceModel(**payload)
-        await resource.save()
+        try:
+            await resource.save()
+        except DuplicateKeyError:
+            raise HTTPConflict(reason=already_exists(payload['id']))
 
         return self.response(201, resource)
 
     async def put(self):
         payload = await self._validate_payload()
-        payload = self._clean_not_editable_fields(payload)
-
-        resource = await self._retrieve_resource()
+        payload = clean_not_editable_fields(payload)
 
-        resource.update(payload)
-        await resource.save()
+        resource_id = self.request.match_info.get('id')
+        resource = await ResourceModel.find_and_update(
+            {'id': resource_id}, payload
+        )
+        if not resource:
+            raise self._not_found(resource_id)
 
         return self.response(200, resource)
 
     async def patch(self):
-        resource = await self._retrieve_resource()
-
         try:
             payload = await self.request.json()
-            payload = self._clean_not_editable_fields(payload)
-            resource.update(payload)
-            ResourceModel.schema.validate(resource.to_dict())
+            if isinstance(payload, dict):
+                payload = clean_not_editable_fields(payload)
+            payload = ResourceModel.validator.validate(payload, partial=True)
         except SchemaError as error:
             raise HTTPBadRequest(reason=error.code)
         except JSONDecodeError:
             raise HTTPBadRequest(reason='Invalid payload')
 
-        await resource.save()
+        resource_id = self.request.match_info.get('id')
+        resource = await ResourceModel.find_and_update(
+            {'id': resource_id}, payload
+        )
+        if not resource:
+            raise self._not_found(resource_id)
 
         return self.response(200, resource)
 
     async def delete(self):
-        resource = await self._retrieve_resource()
+        resource_id = self.request.match_info.get('id')
+        resource = await ResourceModel.find_and_delete({'id': resource_id})
+        if not resource:
+            raise self._not_found(resource_id)
 
-        await resource.delete()
         return self.response(204)
 
-    async def _retrieve_resource(self):
+    async def _retrieve_resource(self, projection=None, raw=False):
         resource_id = self.request.match_info.get('id')
-        resource = await ResourceModel.get(id=resource_id)
+        resource = await ResourceModel.get(
+            projection=projection, raw=raw, id=resource_id
+        )
         if not resource:
-            raise HTTPNotFound(
-                reason='Resource {} not found'.format(resource_id)
-            )
+            raise self._not_found(resource_id)
         return resource
 
+    def _not_found(self, resource_id):
+        return HTTPNotFound(reason=not_found(resource_id))
+
     async def _validate_payload(self):
         try:
             payload = await self.request.json()
-            ResourceModel.schema.validate(payload)
+            payload = ResourceModel.validator.validate(payload)
         except SchemaError as error:
             raise HTTPBadRequest(reason=error.code)
         except JSONDecodeError:
             raise HTTPBadRequest(reason='Invalid payload')
         return payload
 
-    def _clean_not_editable_fields(self, payload):
-        not_editable_fields = ('id', 'sku', 'seller', 'campaign_code')
-        return {
-            k: v
-            for k, v in payload.items()
-            if k not in not_editable_fields
-        }
 
+class BatchGetResourcesView(BaseView):
 
-class UploadResourcesView(BaseView):
+    max_ids = RESOURCE_BATCH_GET_MAX_IDS
 
-    resource = namedtuple(
-        'Resource',
-        (
-            'sku', 'seller', 'campaign_code', 'product_name', 'brand',
-            'category', 'subcategory', 'size', 'list_price', 'price'
+    async def post(self):
+        ids = await self._validate_payload()
+        projection = self._prepare_projection(
+            ResourceModel.projection_fields
         )
-    )
 
-    async def post(self):
-        data = await self.request.post()
+        documents = await ResourceModel.get_many(
+            ids, projection=self._raw_projection(projection), raw=True
+        )
+        found = dict(zip(
+            documents,
+            decode_raw_documents(list(documents.values()), self.id_fields)
+        ))
+
+        return self.response(200, {
+            'resources': [found.get(resource_id) for resource_id in ids],
+            'not_found': [
+                resource_id for resource_id in dict.fromkeys(ids)
+                if resource_id not in found
+            ]
+        })
+
+    async def _validate_payload(self):
+        try:
+            payload = await self.request.json()
+        except JSONDecodeError:
+            raise HTTPBadRequest(reason='Invalid payload')
 
-        if (
-            not data.get('csv_file') or
-            not isinstance(data['csv_file'], FileField)
+        ids = payload.get('ids') if isinstance(payload, dict) else None
+        if not isinstance(ids, list) or not all(
+            isinstance(resource_id, str) for resource_id in ids
         ):
-            raise HTTPBadRequest(reason='Not a valid csv file')
+            raise HTTPBadRequest(reason='ids should be a list of strings')
+        if len(ids) > self.max_ids:
+            raise HTTPBadRequest(
+                reason='Too many ids, at most {} are allowed'.format(
+                    self.max_ids
+                )
+            )
+        return ids
 
-        resources = await self._read_file(data['csv_file'].file.read())
 
-        tasks = [
-            self._create_or_update_resource(resource)
-            for resource in resources
+class BulkResourcesView(BaseView):
+
+    max_operations = RESOURCE_BULK_MAX_OPERATIONS
+
+    async def post(self):
+        operations = await self._validate_payload()
+        results = [
+            {'op': operation.get('op'), 'id': operation.get('id')}
+            if isinstance(operation, dict) else {'op': None, 'id': None}
+            for operation in operations
         ]
 
-        resources_status = await asyncio.gather(*tasks)
-        resources_failed = [r for r in resources_status if r is not None]
+        prepared = []
+        for index, operation in enumerate(operations):
+            try:
+                prepared.append((index,) + self._prepare(operation))
+            except SchemaError as error:
+                self._fail(results[index], 400, error.code)
+
+        # the operations run unordered, so several of them on the same
+        # resource would have no defined outcome
+        targets = Counter(resource_id for _, _, resource_id, _ in prepared)
+        for index, _, resource_id, _ in prepared:
+            if targets[resource_id] > 1:
+                results[index]['id'] = resource_id
+                self._fail(results[index], 400, repeated_target(resource_id))
+        prepared = [
+            operation for operation in prepared
+            if targets[operation[2]] == 1
+        ]
 
-        if resources_failed:
-            return self.response(207, {'resources_failed': resources_failed})
-        return self.response(204)
+        existing = await ResourceModel.existing_keys(
+            resource_id for _, op, resource_id, _ in prepared
+            if op != 'create'
+        )
 
-    async def _read_file(self, csv_content):
-        resources = []
+        requests = []
+        indexes = []
+        for index, op, resource_id, values in prepared:
+            results[index]['id'] = resource_id
+            if op != 'create' and resource_id not in existing:
+                self._fail(results[index], 404, not_found(resource_id))
+                continue
 
-        lines = csv_content.decode('utf-8').strip().split('\n')
+            requests.append(self._write_request(op, resource_id, values))
+            indexes.append(index)
 
-        for line in lines:
-            resources.append(self.resource(*line.split(',')))
+        errors = await ResourceModel.bulk_write(
+            requests, keys=[results[index]['id'] for index in indexes]
+        )
 
-        return resources
+        for position, index in enumerate(indexes):
+            result = results[index]
+            error = errors.get(position)
+            if not error:
+                result['status'] = BULK_OPERATIONS[result['op']]
+            elif error['code'] == 11000:
+                self._fail(result, 409, already_exists(result['id']))
+            else:
+                self._fail(result, 500, error['errmsg'])
+
+        status = 200
+        if any(result['status'] >= 400 for result in results):
+            status = 207
+        return self.response(status, {'results': results})
 
-    async def _create_or_update_resource(self, data):
+    async def _validate_payload(self):
         try:
-            resource_payload = ResourceModel.schema.validate(data._asdict())
-        except SchemaError as error:
-            return 'Fail to create or update {}, reason: {}'.format(
-                data, error.code
+            operations = await self.request.json()
+        except JSONDecodeError:
+            raise HTTPBadRequest(reason='Invalid payload')
+
+        if not isinstance(operations, list):
+            raise HTTPBadRequest(reason='Payload should be a list')
+        if len(operations) > self.max_operations:
+            raise HTTPBadRequest(
+                reason='Too many operations, at most {} are allowed'.format(
+                    self.max_operations
+                )
             )
+        return operations
+
+    def _prepare(self, operation):
+        if not isinstance(operation, dict) or (
+            operation.get('op') not in BULK_OPERATIONS
+        ):
+            raise SchemaError('Invalid operation')
+
+        op = operation['op']
+        resource = operation.get('resource')
 
-        resource_payload['id'] = generate_resource_id(
-            data.sku, data.seller, data.campaign_code
+        if op == 'create':
+            values = ResourceModel.validator.validate(resource)
+            values.pop('_id', None)
+            values['id'] = generate_resource_id(
+                values['sku'], values['seller'], values['campaign_code']
+            )
+            return op, values['id'], values
+
+        resource_id = operation.get('id')
+        if not isinstance(resource_id, str):
+            raise SchemaError('Missing id')
+
+        if op == 'delete':
+            return op, resource_id, None
+        if op == 'update':
+            values = ResourceModel.validator.validate(resource)
+            return op, resource_id, clean_not_editable_fields(values)
+
+        if isinstance(resource, dict):
+            resource = clean_not_editable_fields(resource)
+        values = ResourceModel.validator.validate(resource, partial=True)
+        return op, resource_id, values
+
+    def _write_request(self, op, resource_id, values):
+        if op == 'create':
+            return InsertOne(ResourceModel._new_document(values))
+        if op == 'delete':
+            return DeleteOne({'id': resource_id})
+        return UpdateOne(
+            {'id': resource_id}, ResourceModel.update_document(values)
         )
 
-        # recalculates resource price
-        resource_payload['price'] = float(format(
-            (resource_payload['list_price'] - resource_payload['price']) * 1.1,
-            '.2f'
-        ))
+    def _fail(self, result, status, error_message):
+        result['status'] = status
+        result['error_message'] = error_message
+
+
+class UploadResourcesView(BaseView):
+
+    async def post(self):
+        csv_file = await self._get_csv_file()
+        content_encoding = csv_file.headers.get(CONTENT_ENCODING)
 
-        await ResourceModel._create_or_update(
-            resource_payload['id'], resource_payload
+        try:
+            stream = DecompressingStream(csv_file, content_encoding)
+        except StreamError as error:
+            raise HTTPBadRequest(reason=str(error))
+
+        if self.request.query.get('async') == 'true':
+            job = await self.request.app.import_jobs.start(
+                csv_file, content_encoding
+            )
+            return self.response(202, {
+                'job_id': job['job_id'],
+                'status': job['status']
+            })
+
+        importer = ResourceImporter(executor=self.request.app.import_executor)
+        try:
+            resources_failed = await importer.run(stream)
+        except (StreamError, csv.Error, UnicodeDecodeError) as error:
+            raise HTTPBadRequest(reason=str(error))
+
+        report = importer.report()
+        if resources_failed:
+            report['resources_failed'] = resources_failed
+            return self.response(207, report)
+        return self.response(200, report)
+
+    async def _get_csv_file(self):
+        if not self.request.content_type.startswith('multipart/'):
+            raise HTTPBadRequest(reason='Not a valid csv file')
+
+        reader = await self.request.multipart()
+
+        while True:
+            part = await reader.next()
+            if part is None:
+                break
+            if (
+                isinstance(part, BodyPartReader) and
+                part.name == 'csv_file' and
+                part.filename
+            ):
+                return part
+            await part.release()
+
+        raise HTTPBadRequest(reason='Not a valid csv file')
+
+
+class ImportJobView(BaseView):
+
+    async def get(self):
+        job_id = self.request.match_info.get('job_id')
+        job = await ImportJobModel.get(job_id=job_id)
+        if not job:
+            raise HTTPNotFound(
+                reason='Import job {} not found'.format(job_id)
+            )
+
+        return self.response(200, self._report(job))
+
+    def _report(self, job):
+        report = job.to_dict()
+        report['throughput'] = None
+        report['eta'] = None
+
+        if self._orphaned(job):
+            report['status'] = ImportJobModel.FAILED
+            report['error'] = 'Import interrupted, its worker stopped'
+            return report
+
+        if job['started_at']:
+            elapsed = (job['finished_at'] or time.time()) - job['started_at']
+            if elapsed > 0:
+                report['throughput'] = round(
+                    job['rows_processed'] / elapsed, 2
+                )
+
+            if job['finished_at']:
+                report['eta'] = 0
+            elif job['bytes_read']:
+                remaining = job['bytes_total'] - job['bytes_read']
+                report['eta'] = round(
+                    elapsed * remaining / job['bytes_read'], 2
+                )
+
+        return report
+
+    def _orphaned(self, job):
+        # the worker running the job died without a chance to mark it
+        return (
+            job['status'] in (ImportJobModel.PENDING, ImportJobModel.RUNNING)
+            and job['heartbeat_at'] is not None
+            and time.time() - job['heartbeat_at'] > (
+                IMPORT_JOB_HEARTBEAT_TIMEOUT
+            )
         )
@@ -1,9 +1,213 @@
 import logging.config  # noqa
+import multiprocessing
 import pathlib
 
-MOTOR_DB = 'sfg_catalog'
-MOTOR_URI = 'mongodb://127.0.0.1:27017/sfg_catalog'
-MOTOR_MAX_POOL_SIZE = 1
+from schema import And, Schema, Use
+
+from sfg_catalog.common.environment import (
+    ImproperlyConfigured,
+    boolean,
+    comma_separated,
+    load_environment,
+    optional_integer,
+    write_concern
+)
+
+READ_PREFERENCES = (
+    'primary', 'primaryPreferred', 'secondary', 'secondaryPreferred',
+    'nearest'
+)
+COMPRESSORS = ('snappy', 'zlib', 'zstd')
+WORKER_CLASSES = {
+    'uvloop': 'aiohttp.GunicornUVLoopWebWorker',
+    'asyncio': 'aiohttp.GunicornWebWorker'
+}
+
+# settings that can be set by environment variables of the same name
+ENVIRONMENT_DEFAULTS = {
+    'MOTOR_URI': 'mongodb://127.0.0.1:27017/sfg_catalog',
+    'MOTOR_DB': 'sfg_catalog',
+    'MOTOR_MIN_POOL_SIZE': 0,
+    'MOTOR_MAX_POOL_SIZE': 100,
+    'MOTOR_MAX_IDLE_TIME_MS': None,
+    'MOTOR_WAIT_QUEUE_TIMEOUT_MS': None,
+    'MOTOR_SERVER_SELECTION_TIMEOUT_MS': 30000,
+    'MOTOR_COMPRESSORS': '',
+    # read preference of the listings, the other reads use the primary
+    'MOTOR_LIST_READ_PREFERENCE': 'primary',
+    # write concern of the single document writes and of the csv imports
+    'MOTOR_WRITE_CONCERN': 'majority',
+    'MOTOR_BULK_WRITE_CONCERN': 1,
+    # gunicorn serving, see gunicorn.conf.py
+    'WEB_BIND': 'localhost:8080',
+    'WEB_WORKERS': multiprocessing.cpu_count(),
+    'WEB_LOOP': 'uvloop',
+    # aiohttp's own default, gunicorn's 2 seconds is too short behind a
+    # load balancer keeping connections open
+    'WEB_KEEPALIVE': 75,
+    'WEB_TIMEOUT': 600,
+    'WEB_GRACEFUL_TIMEOUT': 60,
+    'WEB_REUSE_PORT': False,
+    # parse and validate csv chunks on a process pool, 0 keeps it on the
+    # loop
+    'CSV_IMPORT_PROCESSES': 0,
+    # how long a stopping worker waits for its background imports
+    'IMPORT_JOB_DRAIN_TIMEOUT': 45
+}
+
+ENVIRONMENT_SCHEMA = Schema({
+    'MOTOR_URI': And(str, len, error='MOTOR_URI should not be empty'),
+    'MOTOR_DB': And(str, len, error='MOTOR_DB should not be empty'),
+    'MOTOR_MIN_POOL_SIZE': And(
+        Use(int), lambda value: value >= 0,
+        error='MOTOR_MIN_POOL_SIZE should be 0 or greater'
+    ),
+    'MOTOR_MAX_POOL_SIZE': And(
+        Use(int), lambda value: value > 0,
+        error='MOTOR_MAX_POOL_SIZE should be greater than 0'
+    ),
+    'MOTOR_MAX_IDLE_TIME_MS': And(
+        Use(optional_integer), lambda value: value is None or value > 0,
+        error='MOTOR_MAX_IDLE_TIME_MS should be greater than 0'
+    ),
+    'MOTOR_WAIT_QUEUE_TIMEOUT_MS': And(
+        Use(optional_integer), lambda value: value is None or value > 0,
+        error='MOTOR_WAIT_QUEUE_TIMEOUT_MS should be greater than 0'
+    ),
+    'MOTOR_SERVER_SELECTION_TIMEOUT_MS': And(
+        Use(int), lambda value: value > 0,
+        error='MOTOR_SERVER_SELECTION_TIMEOUT_MS should be greater than 0'
+    ),
+    'MOTOR_COMPRESSORS': And(
+        Use(comma_separated),
+        lambda value: set(value) <= set(COMPRESSORS),
+        error='MOTOR_COMPRESSORS should be some of {}'.format(
+            ', '.join(COMPRESSORS)
+        )
+    ),
+    'MOTOR_LIST_READ_PREFERENCE': And(
+        str, lambda value: value in READ_PREFERENCES,
+        error='MOTOR_LIST_READ_PREFERENCE should be one of {}'.format(
+            ', '.join(READ_PREFERENCES)
+        )
+    ),
+    # the writes need to be acknowledged to report their failures
+    'MOTOR_WRITE_CONCERN': And(
+        Use(write_concern), lambda value: value == 'majority' or value > 0,
+        error='MOTOR_WRITE_CONCERN should be majority or greater than 0'
+    ),
+    'MOTOR_BULK_WRITE_CONCERN': And(
+        Use(write_concern), lambda value: value == 'majority' or value > 0,
+        error='MOTOR_BULK_WRITE_CONCERN should be majority or greater than 0'
+    ),
+    'WEB_BIND': And(str, len, error='WEB_BIND should not be empty'),
+    'WEB_WORKERS': And(
+        Use(int), lambda value: value > 0,
+        error='WEB_WORKERS should be greater than 0'
+    ),
+    'WEB_LOOP': And(
+        str, lambda value: value in WORKER_CLASSES,
+        error='WEB_LOOP should be one of {}'.format(
+            ', '.join(WORKER_CLASSES)
+        )
+    ),
+    'WEB_KEEPALIVE': And(
+        Use(int), lambda value: value >= 0,
+        error='WEB_KEEPALIVE should be 0 or greater'
+    ),
+    'WEB_TIMEOUT': And(
+        Use(int), lambda value: value >= 0,
+        error='WEB_TIMEOUT should be 0 or greater'
+    ),
+    'WEB_GRACEFUL_TIMEOUT': And(
+        Use(int), lambda value: value > 0,
+        error='WEB_GRACEFUL_TIMEOUT should be greater than 0'
+    ),
+    'WEB_REUSE_PORT': And(
+        Use(boolean), error='WEB_REUSE_PORT should be true or false'
+    ),
+    'CSV_IMPORT_PROCESSES': And(
+        Use(int), lambda value: value >= 0,
+        error='CSV_IMPORT_PROCESSES should be 0 or greater'
+    ),
+    'IMPORT_JOB_DRAIN_TIMEOUT': And(
+        Use(int), lambda value: value >= 0,
+        error='IMPORT_JOB_DRAIN_TIMEOUT should be 0 or greater'
+    )
+})
+
+ENVIRONMENT = load_environment(ENVIRONMENT_SCHEMA, ENVIRONMENT_DEFAULTS)
+if ENVIRONMENT['MOTOR_MIN_POOL_SIZE'] > ENVIRONMENT['MOTOR_MAX_POOL_SIZE']:
+    raise ImproperlyConfigured(
+        'Invalid settings: MOTOR_MIN_POOL_SIZE should not be greater than'
+        ' MOTOR_MAX_POOL_SIZE'
+    )
+# the aiohttp worker waits up to 95% of the graceful timeout for the
+# in-flight requests, the import jobs drain meanwhile and must be done
+# by then, leaving the rest to interrupt them before gunicorn kills it
+if (ENVIRONMENT['IMPORT_JOB_DRAIN_TIMEOUT'] >=
+        ENVIRONMENT['WEB_GRACEFUL_TIMEOUT'] * 0.95):
+    raise ImproperlyConfigured(
+        'Invalid settings: IMPORT_JOB_DRAIN_TIMEOUT should be lower than'
+        ' 95% of WEB_GRACEFUL_TIMEOUT'
+    )
+
+MOTOR_URI = ENVIRONMENT['MOTOR_URI']
+MOTOR_DB = ENVIRONMENT['MOTOR_DB']
+MOTOR_MIN_POOL_SIZE = ENVIRONMENT['MOTOR_MIN_POOL_SIZE']
+MOTOR_MAX_POOL_SIZE = ENVIRONMENT['MOTOR_MAX_POOL_SIZE']
+MOTOR_MAX_IDLE_TIME_MS = ENVIRONMENT['MOTOR_MAX_IDLE_TIME_MS']
+MOTOR_WAIT_QUEUE_TIMEOUT_MS = ENVIRONMENT['MOTOR_WAIT_QUEUE_TIMEOUT_MS']
+MOTOR_SERVER_SELECTION_TIMEOUT_MS = ENVIRONMENT[
+    'MOTOR_SERVER_SELECTION_TIMEOUT_MS'
+]
+MOTOR_COMPRESSORS = ENVIRONMENT['MOTOR_COMPRESSORS']
+MOTOR_LIST_READ_PREFERENCE = ENVIRONMENT['MOTOR_LIST_READ_PREFERENCE']
+# write concern by profile, see `sfg_catalog.common.mongo.WRITE_CONCERNS`
+MOTOR_WRITE_CONCERNS = {
+    'default': ENVIRONMENT['MOTOR_WRITE_CONCERN'],
+    'bulk': ENVIRONMENT['MOTOR_BULK_WRITE_CONCERN']
+}
+MOTOR_BULK_WRITE_BATCH_SIZE = 500
+MOTOR_STREAM_BATCH_SIZE = 500
+
+# read-through cache for `get` by id, in seconds and documents
+MODEL_CACHE_TTL = 60
+RESOURCE_CACHE_SIZE = 10000
+# response cache of the listings, in seconds and responses
+LIST_CACHE_TTL = 30
+RESOURCE_LIST_CACHE_SIZE = 1000
+# versions of the collections, giving the ETags of the listings
+COLLECTION_VERSIONS = 'collection_versions'
+# capped collection broadcasting cache invalidations to every worker
+INVALIDATION_BUS_COLLECTION = 'cache_invalidations'
+INVALIDATION_BUS_SIZE = 16 * 1024 * 1024
+INVALIDATION_BUS_POLL_INTERVAL = 1
+
+# most ids fetched by a single `/resources/batch_get/` request
+RESOURCE_BATCH_GET_MAX_IDS = 100
+# most operations run by a single `/resources/bulk/` request
+RESOURCE_BULK_MAX_OPERATIONS = 1000
+
+CSV_IMPORT_CHUNK_SIZE = 1000
+CSV_IMPORT_QUEUE_SIZE = 4
+CSV_IMPORT_WRITERS = 2
+CSV_IMPORT_PROCESSES = ENVIRONMENT['CSV_IMPORT_PROCESSES']
+
+IMPORT_JOB_SPOOL_DIR = None
+IMPORT_JOB_PROGRESS_INTERVAL = 1
+IMPORT_JOB_MAX_FAILURES = 1000
+# a running job not saved for this long lost its worker
+IMPORT_JOB_HEARTBEAT_TIMEOUT = 60
+IMPORT_JOB_DRAIN_TIMEOUT = ENVIRONMENT['IMPORT_JOB_DRAIN_TIMEOUT']
+
+WEB_BIND = ENVIRONMENT['WEB_BIND']
+WEB_WORKERS = ENVIRONMENT['WEB_WORKERS']
+WEB_WORKER_CLASS = WORKER_CLASSES[ENVIRONMENT['WEB_LOOP']]
+WEB_KEEPALIVE = ENVIRONMENT['WEB_KEEPALIVE']
+WEB_TIMEOUT = ENVIRONMENT['WEB_TIMEOUT']
+WEB_GRACEFUL_TIMEOUT = ENVIRONMENT['WEB_GRACEFUL_TIMEOUT']
+WEB_REUSE_PORT = ENVIRONMENT['WEB_REUSE_PORT']
 
 BASE_DIR = pathlib.Path(__file__).parent.parent
 TEMPLATES_DIR = str(BASE_DIR / 'sfg_catalog' / 'templates')